@@ -0,0 +1,114 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import chess
+import current_engine as engine
+from bitboard import move_to_uci
+from uci import score_string
+
+search_depth = engine.MAX_PLY
+search_time = None
+search_lines = 1
+
+def read_fens(stream):
+    for line in stream:
+        fen = line.strip()
+        if fen and not fen.startswith('#'):
+            yield fen
+
+def read_source(path):
+    # mate_in_N.json style files map FENs to solutions; anything else is one FEN per line
+    if path.endswith('.json'):
+        with open(path, "r") as f:
+            yield from json.load(f)
+    else:
+        with open(path, "r") as f:
+            yield from read_fens(f)
+
+def init_worker(hash_size_mb, tablebase_directory, depth, time_limit, lines=1):
+    # Every worker owns its transposition table; nothing is shared between them
+    global search_depth, search_time, search_lines
+    engine.set_hash_size(hash_size_mb)
+    if tablebase_directory:
+        engine.load_tablebases(tablebase_directory)
+    search_depth, search_time, search_lines = depth, time_limit, lines
+
+def analyze_fen(task):
+    index, fen = task
+    try:
+        board = chess.Board(fen)
+    except ValueError as error:
+        return {"index": index, "fen": fen, "error": str(error)}
+    if board.is_game_over():
+        return {"index": index, "fen": fen, "error": f"game over: {board.result()}"}
+    last = {}
+
+    def report(depth, value, nodes, elapsed, pv):
+        last.update(depth=depth, score=score_string(value, board.turn), pv=[move_to_uci(action) for action in pv])
+
+    start_time = time.time()
+    best_move, _ = engine.iterative_deepening(board, board.turn, search_depth, search_time, report=report, lines=search_lines)
+    elapsed = time.time() - start_time
+    result = {
+        "index": index,
+        "fen": fen,
+        "move": best_move.uci() if best_move is not None else None,
+        "score": last.get("score"),
+        "depth": last.get("depth", 0),
+        "pv": last.get("pv", []),
+        "nodes": engine.counter,
+        "time": elapsed,
+        "worker": os.getpid(),
+    }
+    if search_lines > 1:
+        result["lines"] = [{"move": move_to_uci(line[0]), "score": score_string(value, board.turn), "pv": [move_to_uci(action) for action in line]}
+                           for _, value, line in engine.multi_pv]
+    return result
+
+def run_analysis(fens, output, workers, hash_size_mb=16, tablebase_directory=None, depth=engine.MAX_PLY, time_limit=None, lines=1):
+    tasks = enumerate(fens)
+    settings = (hash_size_mb, tablebase_directory, depth, time_limit, lines)
+    analyzed = 0
+    if workers == 1:
+        init_worker(*settings)
+        results = map(analyze_fen, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=settings)
+        # Results are written in completion order; "index" gives the input line
+        results = pool.imap_unordered(analyze_fen, tasks)
+    try:
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            analyzed += 1
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return analyzed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze FENs in parallel and write one JSON line per position as it finishes")
+    parser.add_argument("input", nargs="?", default="-", help="file with one FEN per line, a mate_in_N.json file, or - for stdin")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of analysis processes")
+    parser.add_argument("--depth", type=int, help="maximum search depth per position")
+    parser.add_argument("--movetime", type=float, help="seconds per position (default 1 when no depth is given)")
+    parser.add_argument("--hash", type=int, default=16, help="transposition table size in MB for each worker")
+    parser.add_argument("--tablebases", metavar="DIR", help="directory of .qtb endgame tables built by tablebase.py")
+    parser.add_argument("--multipv", type=int, default=1, metavar="K", help="report the best K root moves, each with its score and PV")
+    parser.add_argument("--output", help="write the JSON lines to this file instead of stdout")
+    args = parser.parse_args()
+    time_limit = args.movetime if args.movetime is not None or args.depth is not None else 1.0
+    fens = read_fens(sys.stdin) if args.input == "-" else read_source(args.input)
+    output = open(args.output, "w") if args.output else sys.stdout
+    start_time = time.time()
+    try:
+        analyzed = run_analysis(fens, output, max(1, args.workers), args.hash, args.tablebases, args.depth or engine.MAX_PLY, time_limit, args.multipv)
+    finally:
+        if args.output:
+            output.close()
+    print(f"analyzed {analyzed} positions in {time.time() - start_time:.1f}s", file=sys.stderr)
@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import sys
+import time
+import chess
+import current_engine as engine
+from bitboard import move_to_uci
+from transposition import MATE_SCORE, MATE_BOUND
+
+MATE_FILES = {2: "mate_in_2.json", 3: "mate_in_3.json", 4: "mate_in_4.json"}
+
+def first_solution_move(board, solution):
+    for token in solution.split():
+        if token[0].isdigit():
+            continue
+        # Some puzzles write promotions as e8/Q
+        return board.parse_san(token.replace('/', '='))
+    return None
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def mate_distance(value, white_to_move):
+    # Moves to mate for the side to move, None when no mate was found
+    if value is None:
+        return None
+    if not white_to_move:
+        value = -value
+    if value < MATE_BOUND:
+        return None
+    return (MATE_SCORE - value + 1) // 2
+
+def solve_position(fen, solution, depth, time_limit, mate_length=None):
+    board = chess.Board(fen)
+    expected = first_solution_move(board, solution)
+    solved_since = [None]
+
+    def report(iteration_depth, value, nodes, elapsed, pv):
+        found = pv and chess.Move.from_uci(move_to_uci(pv[0])) == expected
+        if not found:
+            solved_since[0] = None
+        elif solved_since[0] is None:
+            solved_since[0] = elapsed
+
+    if engine.transposition_table.mapping is None:
+        engine.transposition_table.clear()
+    engine.transposition_table.probes = engine.transposition_table.hits = 0
+    start_time = time.time()
+    best_move, best_value = engine.iterative_deepening(board, board.turn, depth, time_limit, report=report)
+    elapsed = time.time() - start_time
+    solved = best_move == expected
+    mate_in = mate_distance(best_value, board.turn)
+    return {
+        "fen": fen,
+        "expected": expected.uci(),
+        "move": best_move.uci() if best_move is not None else None,
+        "solved": solved,
+        "mate_in": mate_in,
+        "fastest_mate": mate_in is not None and mate_length is not None and mate_in <= mate_length,
+        "nodes": engine.counter,
+        "time": elapsed,
+        "time_to_solution": (solved_since[0] if solved_since[0] is not None else elapsed) if solved else None,
+        "tt_probes": engine.transposition_table.probes,
+        "tt_hits": engine.transposition_table.hits,
+        "iterations": engine.search_trace,
+    }
+
+def summarize(results):
+    nodes = sum(result["nodes"] for result in results)
+    elapsed = sum(result["time"] for result in results)
+    probes = sum(result["tt_probes"] for result in results)
+    solve_times = sorted(result["time_to_solution"] for result in results if result["solved"])
+    return {
+        "positions": len(results),
+        "solved": len(solve_times),
+        "solve_rate": len(solve_times) / len(results) if results else 0.0,
+        "fastest_mate_rate": sum(result["fastest_mate"] for result in results) / len(results) if results else 0.0,
+        "nodes": nodes,
+        "time": elapsed,
+        "nps": int(nodes / elapsed) if elapsed > 0 else 0,
+        "time_to_solution": {
+            "p50": percentile(solve_times, 0.5),
+            "p90": percentile(solve_times, 0.9),
+            "p99": percentile(solve_times, 0.99),
+            "max": solve_times[-1] if solve_times else None,
+        },
+        "tt_hit_rate": sum(result["tt_hits"] for result in results) / probes if probes else 0.0,
+    }
+
+def run_benchmark(mate_lengths, directory, depth=None, time_limit=None, limit=None, verbose=False):
+    report = {"depth": depth, "movetime": time_limit, "suites": {}}
+    for mate_length in mate_lengths:
+        with open(os.path.join(directory, MATE_FILES[mate_length]), "r") as f:
+            puzzles = list(json.load(f).items())
+        if limit is not None:
+            puzzles = puzzles[:limit]
+        # A mate in N needs 2N-1 plies when neither depth nor time is forced
+        if depth is not None:
+            suite_depth = depth
+        elif time_limit is not None:
+            suite_depth = engine.MAX_PLY
+        else:
+            suite_depth = 2 * mate_length - 1
+        results = []
+        for fen, solution in puzzles:
+            result = solve_position(fen, solution, suite_depth, time_limit, mate_length)
+            results.append(result)
+            if verbose:
+                print(json.dumps(result), file=sys.stderr)
+        report["suites"][f"mate_in_{mate_length}"] = summarize(results)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the engine over the mate-in-N puzzle files and report JSON statistics")
+    parser.add_argument("--mates", type=int, nargs="+", default=[2, 3, 4], choices=sorted(MATE_FILES), help="which mate_in_N files to run")
+    parser.add_argument("--dir", default=os.path.dirname(os.path.abspath(__file__)), help="directory holding the mate_in_N.json files")
+    parser.add_argument("--depth", type=int, help="fixed search depth (default 2N-1 per file, unlimited with --movetime)")
+    parser.add_argument("--movetime", type=float, help="seconds per position")
+    parser.add_argument("--limit", type=int, help="only run the first LIMIT positions of each file")
+    parser.add_argument("--hash", type=int, default=16, help="transposition table size in MB")
+    parser.add_argument("--tt-file", help="start from (and update) a persistent transposition table file instead of an empty table")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--disable", nargs="+", default=[], choices=sorted(engine.search_features), help="search features to switch off")
+    parser.add_argument("--verbose", action="store_true", help="print one JSON line per position to stderr")
+    args = parser.parse_args()
+    if args.tt_file:
+        engine.open_hash_file(args.tt_file, args.hash)
+    else:
+        engine.set_hash_size(args.hash)
+    for feature in args.disable:
+        engine.search_features[feature] = False
+    report = run_benchmark(args.mates, args.dir, args.depth, args.movetime, args.limit, args.verbose)
+    report["features"] = dict(engine.search_features)
+    if args.tt_file:
+        engine.transposition_table.close()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
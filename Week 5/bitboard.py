@@ -0,0 +1,647 @@
+import random
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 0, 1, 2, 3, 4, 5
+WHITE_PAWN, WHITE_KING = 0, 5
+BLACK_PAWN, BLACK_KING = 6, 11
+EMPTY = -1
+PIECE_SYMBOLS = 'PNBRQKpnbrqk'
+PROMOTION_SYMBOLS = ' nbrq'
+
+# A move is a plain int: from | to << 6 | promotion piece type << 12 | flags
+MOVE_EP = 1 << 15
+MOVE_CASTLE = 1 << 16
+MOVE_DOUBLE_PUSH = 1 << 17
+
+CASTLE_WHITE_KING, CASTLE_WHITE_QUEEN = 1, 2
+CASTLE_BLACK_KING, CASTLE_BLACK_QUEEN = 4, 8
+
+FULL = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_2 = RANK_1 << 8
+RANK_3 = RANK_1 << 16
+RANK_6 = RANK_1 << 40
+RANK_7 = RANK_1 << 48
+RANK_8 = RANK_1 << 56
+
+BB = [1 << sq for sq in range(64)]
+SQUARE_NAMES = [file + rank for rank in '12345678' for file in 'abcdefgh']
+
+def lsb(bitboard):
+    return (bitboard & -bitboard).bit_length() - 1
+
+def msb(bitboard):
+    return bitboard.bit_length() - 1
+
+def popcount(bitboard):
+    return bin(bitboard).count('1')
+
+def squares(bitboard):
+    result = []
+    while bitboard:
+        low = bitboard & -bitboard
+        result.append(low.bit_length() - 1)
+        bitboard ^= low
+    return result
+
+def _step_attacks(deltas):
+    table = []
+    for sq in range(64):
+        rank, file = divmod(sq, 8)
+        attacks = 0
+        for dr, df in deltas:
+            r, f = rank + dr, file + df
+            if 0 <= r < 8 and 0 <= f < 8:
+                attacks |= BB[r * 8 + f]
+        table.append(attacks)
+    return table
+
+def _ray(dr, df):
+    table = []
+    for sq in range(64):
+        rank, file = divmod(sq, 8)
+        ray = 0
+        r, f = rank + dr, file + df
+        while 0 <= r < 8 and 0 <= f < 8:
+            ray |= BB[r * 8 + f]
+            r, f = r + dr, f + df
+        table.append(ray)
+    return table
+
+KNIGHT_ATTACKS = _step_attacks([(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_ATTACKS = _step_attacks([(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+PAWN_ATTACKS = [_step_attacks([(1, -1), (1, 1)]), _step_attacks([(-1, -1), (-1, 1)])]
+
+# Positive rays grow towards h8, so the nearest blocker is the lowest set bit;
+# negative rays grow towards a1, so the nearest blocker is the highest one.
+RAY_N, RAY_E, RAY_NE, RAY_NW = _ray(1, 0), _ray(0, 1), _ray(1, 1), _ray(1, -1)
+RAY_S, RAY_W, RAY_SW, RAY_SE = _ray(-1, 0), _ray(0, -1), _ray(-1, -1), _ray(-1, 1)
+ROOK_RAYS_POSITIVE = (RAY_N, RAY_E)
+ROOK_RAYS_NEGATIVE = (RAY_S, RAY_W)
+BISHOP_RAYS_POSITIVE = (RAY_NE, RAY_NW)
+BISHOP_RAYS_NEGATIVE = (RAY_SW, RAY_SE)
+
+def _between():
+    table = [[0] * 64 for _ in range(64)]
+    for rays in (ROOK_RAYS_POSITIVE, ROOK_RAYS_NEGATIVE, BISHOP_RAYS_POSITIVE, BISHOP_RAYS_NEGATIVE):
+        for ray in rays:
+            for sq in range(64):
+                for target in squares(ray[sq]):
+                    table[sq][target] = ray[sq] & ~ray[target] & ~BB[target]
+    return table
+
+# Squares strictly between two squares on a shared line, 0 otherwise
+BETWEEN = _between()
+
+# Piece values used by static exchange evaluation, indexed by piece type
+SEE_VALUES = (100, 320, 330, 500, 900, 20000)
+
+# Castling rights that survive a move touching the square
+CASTLING_MASK = [15] * 64
+CASTLING_MASK[0] = 15 ^ CASTLE_WHITE_QUEEN
+CASTLING_MASK[4] = 15 ^ (CASTLE_WHITE_KING | CASTLE_WHITE_QUEEN)
+CASTLING_MASK[7] = 15 ^ CASTLE_WHITE_KING
+CASTLING_MASK[56] = 15 ^ CASTLE_BLACK_QUEEN
+CASTLING_MASK[60] = 15 ^ (CASTLE_BLACK_KING | CASTLE_BLACK_QUEEN)
+CASTLING_MASK[63] = 15 ^ CASTLE_BLACK_KING
+
+# King destination -> (rook from, rook to)
+CASTLING_ROOK = {6: (7, 5), 2: (0, 3), 62: (63, 61), 58: (56, 59)}
+
+# Zobrist keys: one per (piece, square), per castling-rights mask, per
+# en-passant file and one for black to move. They come from a fixed seed
+# so keys stored on disk (tables, books) stay valid across runs.
+ZOBRIST_SEED = 0x5175656E73
+_zobrist_random = random.Random(ZOBRIST_SEED)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(12)]
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_EP = [_zobrist_random.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK = _zobrist_random.getrandbits(64)
+# Identifies the key schedule in file headers
+ZOBRIST_SIGNATURE = ZOBRIST_PIECES[0][0] ^ ZOBRIST_CASTLING[15] ^ ZOBRIST_EP[7] ^ ZOBRIST_BLACK
+
+def rook_attacks(sq, occupied):
+    attacks = 0
+    for table in ROOK_RAYS_POSITIVE:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= table[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for table in ROOK_RAYS_NEGATIVE:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= table[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+def bishop_attacks(sq, occupied):
+    attacks = 0
+    for table in BISHOP_RAYS_POSITIVE:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= table[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for table in BISHOP_RAYS_NEGATIVE:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= table[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+def make_move_code(from_sq, to_sq, promotion=0, flags=0):
+    return from_sq | to_sq << 6 | promotion << 12 | flags
+
+def move_from(move):
+    return move & 63
+
+def move_to(move):
+    return (move >> 6) & 63
+
+def move_promotion(move):
+    return (move >> 12) & 7
+
+def move_to_uci(move):
+    uci = SQUARE_NAMES[move & 63] + SQUARE_NAMES[(move >> 6) & 63]
+    promotion = (move >> 12) & 7
+    if promotion:
+        uci += PROMOTION_SYMBOLS[promotion]
+    return uci
+
+class Position:
+    def __init__(self):
+        self.bb = [0] * 12
+        self.occ = [0, 0]
+        self.board = [EMPTY] * 64
+        self.turn = True
+        self.castling = 0
+        self.ep = -1
+        self.halfmove = 0
+        self.fullmove = 1
+        self.hash = 0
+        self.stack = []
+
+    @classmethod
+    def from_fen(cls, fen):
+        pos = cls()
+        fields = fen.split()
+        placement = fields[0]
+        rank, file = 7, 0
+        for char in placement:
+            if char == '/':
+                rank, file = rank - 1, 0
+            elif char.isdigit():
+                file += int(char)
+            else:
+                pos.put_piece(PIECE_SYMBOLS.index(char), rank * 8 + file)
+                file += 1
+        pos.turn = len(fields) < 2 or fields[1] == 'w'
+        if len(fields) > 2:
+            for char, right in zip('KQkq', (CASTLE_WHITE_KING, CASTLE_WHITE_QUEEN, CASTLE_BLACK_KING, CASTLE_BLACK_QUEEN)):
+                if char in fields[2]:
+                    pos.castling |= right
+        if len(fields) > 3 and fields[3] != '-':
+            pos.ep = SQUARE_NAMES.index(fields[3])
+        if len(fields) > 4:
+            pos.halfmove = int(fields[4])
+        if len(fields) > 5:
+            pos.fullmove = int(fields[5])
+        pos.hash = pos.compute_hash()
+        return pos
+
+    @classmethod
+    def from_board(cls, board_obj):
+        # Replays the moves since the last irreversible one, so the stack
+        # already holds the hashes repetition detection looks back through
+        reversible = min(board_obj.halfmove_clock, len(board_obj.move_stack))
+        root = board_obj.copy(stack=reversible)
+        moves = [root.pop() for _ in range(reversible)]
+        pos = cls.from_fen(root.fen())
+        for move in reversed(moves):
+            pos.make_move(pos.parse_uci(move.uci()))
+        return pos
+
+    def fen(self):
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = '', 0
+            for file in range(8):
+                piece = self.board[rank * 8 + file]
+                if piece == EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    row, empty = row + str(empty), 0
+                row += PIECE_SYMBOLS[piece]
+            rows.append(row + (str(empty) if empty else ''))
+        castling = ''.join(char for char, right in zip('KQkq', (1, 2, 4, 8)) if self.castling & right) or '-'
+        ep = SQUARE_NAMES[self.ep] if self.ep != -1 else '-'
+        return f"{'/'.join(rows)} {'w' if self.turn else 'b'} {castling} {ep} {self.halfmove} {self.fullmove}"
+
+    def put_piece(self, piece, sq):
+        self.bb[piece] |= BB[sq]
+        self.occ[piece // 6] |= BB[sq]
+        self.board[sq] = piece
+
+    def _ep_key(self):
+        # The en-passant square only changes the position if it can be taken
+        if self.ep != -1 and PAWN_ATTACKS[1 if self.turn else 0][self.ep] & self.bb[WHITE_PAWN if self.turn else BLACK_PAWN]:
+            return ZOBRIST_EP[self.ep & 7]
+        return 0
+
+    def compute_hash(self):
+        key = 0
+        for sq in range(64):
+            if self.board[sq] != EMPTY:
+                key ^= ZOBRIST_PIECES[self.board[sq]][sq]
+        key ^= ZOBRIST_CASTLING[self.castling] ^ self._ep_key()
+        if not self.turn:
+            key ^= ZOBRIST_BLACK
+        return key
+
+    def piece_at(self, sq):
+        piece = self.board[sq]
+        return None if piece == EMPTY else PIECE_SYMBOLS[piece]
+
+    def king_square(self, white):
+        return lsb(self.bb[WHITE_KING if white else BLACK_KING])
+
+    def is_square_attacked(self, sq, by_white, occupied=None):
+        bb = self.bb
+        base = 0 if by_white else 6
+        if KNIGHT_ATTACKS[sq] & bb[base + KNIGHT]:
+            return True
+        if KING_ATTACKS[sq] & bb[base + KING]:
+            return True
+        # A white pawn attacks sq exactly when a black pawn on sq would attack it
+        if PAWN_ATTACKS[1 if by_white else 0][sq] & bb[base + PAWN]:
+            return True
+        if occupied is None:
+            occupied = self.occ[0] | self.occ[1]
+        queens = bb[base + QUEEN]
+        diagonal = bb[base + BISHOP] | queens
+        if diagonal and bishop_attacks(sq, occupied) & diagonal:
+            return True
+        straight = bb[base + ROOK] | queens
+        if straight and rook_attacks(sq, occupied) & straight:
+            return True
+        return False
+
+    def attackers_to(self, sq, occupied):
+        # Pieces of both colours attacking sq, given an occupancy so that
+        # exchanges can remove pieces and uncover x-ray attackers
+        bb = self.bb
+        bishops = bb[2] | bb[4] | bb[8] | bb[10]
+        rooks = bb[3] | bb[4] | bb[9] | bb[10]
+        attackers = (PAWN_ATTACKS[1][sq] & bb[WHITE_PAWN]) | (PAWN_ATTACKS[0][sq] & bb[BLACK_PAWN])
+        attackers |= KNIGHT_ATTACKS[sq] & (bb[1] | bb[7])
+        attackers |= KING_ATTACKS[sq] & (bb[5] | bb[11])
+        attackers |= bishop_attacks(sq, occupied) & bishops
+        attackers |= rook_attacks(sq, occupied) & rooks
+        return attackers & occupied
+
+    def see(self, move):
+        # Swap-list static exchange evaluation: the material the side to
+        # move expects to win by starting a capture sequence with move. The
+        # list is built to the end of the sequence (no early cut-off, which
+        # would only keep the sign) and folded back with negamax.
+        board, bb = self.board, self.bb
+        from_sq = move & 63
+        to_sq = (move >> 6) & 63
+        occupied = self.occ[0] | self.occ[1]
+        gain = [0] * 32
+        if move & MOVE_EP:
+            gain[0] = SEE_VALUES[PAWN]
+            occupied ^= BB[to_sq - 8 if self.turn else to_sq + 8]
+        elif board[to_sq] != EMPTY:
+            gain[0] = SEE_VALUES[board[to_sq] % 6]
+        attacker_type = board[from_sq] % 6
+        promotion = (move >> 12) & 7
+        if promotion:
+            gain[0] += SEE_VALUES[promotion] - SEE_VALUES[PAWN]
+            attacker_type = promotion
+        occupied ^= BB[from_sq]
+        side = 1 if self.turn else 0
+        depth = 0
+        while True:
+            depth += 1
+            gain[depth] = SEE_VALUES[attacker_type] - gain[depth - 1]
+            attackers = self.attackers_to(to_sq, occupied) & self.occ[side]
+            if not attackers:
+                break
+            base = 6 * side
+            for attacker_type in range(6):
+                candidates = attackers & bb[base + attacker_type]
+                if candidates:
+                    occupied ^= candidates & -candidates
+                    break
+            side ^= 1
+            if depth == 31:
+                break
+        while depth > 1:
+            depth -= 1
+            gain[depth - 1] = -max(-gain[depth - 1], gain[depth])
+        return gain[0]
+
+    def is_check(self):
+        return self.is_square_attacked(self.king_square(self.turn), not self.turn)
+
+    def generate_pseudo_legal_moves(self, captures_only=False):
+        moves = []
+        append = moves.append
+        bb = self.bb
+        white = self.turn
+        us, them = (0, 1) if white else (1, 0)
+        base = 6 * us
+        own = self.occ[us]
+        enemy = self.occ[them]
+        occupied = own | enemy
+        empty = ~occupied & FULL
+        targets = enemy if captures_only else ~own & FULL
+
+        pawns = bb[base + PAWN]
+        if white:
+            single = (pawns << 8) & empty
+            double = ((single & RANK_3) << 8) & empty
+            left = ((pawns & ~FILE_A) << 7) & enemy
+            right = ((pawns & ~FILE_H) << 9) & enemy
+            push, left_delta, right_delta, last_rank = 8, 7, 9, RANK_8
+        else:
+            single = (pawns >> 8) & empty
+            double = ((single & RANK_6) >> 8) & empty
+            left = ((pawns & ~FILE_A) >> 9) & enemy
+            right = ((pawns & ~FILE_H) >> 7) & enemy
+            push, left_delta, right_delta, last_rank = -8, -9, -7, RANK_1
+        if captures_only:
+            # Queen promotions are kept as tactical moves even when quiet
+            single &= last_rank
+            double = 0
+        for to_set, delta in ((single, push), (left, left_delta), (right, right_delta)):
+            while to_set:
+                low = to_set & -to_set
+                to_sq = low.bit_length() - 1
+                to_set ^= low
+                from_sq = to_sq - delta
+                if low & last_rank:
+                    append(from_sq | to_sq << 6 | QUEEN << 12)
+                    if not captures_only:
+                        append(from_sq | to_sq << 6 | KNIGHT << 12)
+                        append(from_sq | to_sq << 6 | ROOK << 12)
+                        append(from_sq | to_sq << 6 | BISHOP << 12)
+                else:
+                    append(from_sq | to_sq << 6)
+        while double:
+            low = double & -double
+            to_sq = low.bit_length() - 1
+            double ^= low
+            append((to_sq - 2 * push) | to_sq << 6 | MOVE_DOUBLE_PUSH)
+        if self.ep != -1:
+            attackers = PAWN_ATTACKS[them][self.ep] & pawns
+            while attackers:
+                low = attackers & -attackers
+                attackers ^= low
+                append((low.bit_length() - 1) | self.ep << 6 | MOVE_EP)
+
+        for piece_type in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            pieces = bb[base + piece_type]
+            while pieces:
+                low = pieces & -pieces
+                from_sq = low.bit_length() - 1
+                pieces ^= low
+                if piece_type == KNIGHT:
+                    attacks = KNIGHT_ATTACKS[from_sq]
+                elif piece_type == BISHOP:
+                    attacks = bishop_attacks(from_sq, occupied)
+                elif piece_type == ROOK:
+                    attacks = rook_attacks(from_sq, occupied)
+                elif piece_type == QUEEN:
+                    attacks = bishop_attacks(from_sq, occupied) | rook_attacks(from_sq, occupied)
+                else:
+                    attacks = KING_ATTACKS[from_sq]
+                attacks &= targets
+                while attacks:
+                    to_low = attacks & -attacks
+                    attacks ^= to_low
+                    append(from_sq | (to_low.bit_length() - 1) << 6)
+
+        if not captures_only and self.castling:
+            if white:
+                if self.castling & CASTLE_WHITE_KING and not occupied & 0x60 and self._can_castle_through((4, 5, 6), False):
+                    append(4 | 6 << 6 | MOVE_CASTLE)
+                if self.castling & CASTLE_WHITE_QUEEN and not occupied & 0x0E and self._can_castle_through((4, 3, 2), False):
+                    append(4 | 2 << 6 | MOVE_CASTLE)
+            else:
+                if self.castling & CASTLE_BLACK_KING and not occupied & (0x60 << 56) and self._can_castle_through((60, 61, 62), True):
+                    append(60 | 62 << 6 | MOVE_CASTLE)
+                if self.castling & CASTLE_BLACK_QUEEN and not occupied & (0x0E << 56) and self._can_castle_through((60, 59, 58), True):
+                    append(60 | 58 << 6 | MOVE_CASTLE)
+        return moves
+
+    def _can_castle_through(self, path, by_white):
+        for sq in path:
+            if self.is_square_attacked(sq, by_white):
+                return False
+        return True
+
+    def pinned(self, white):
+        king = self.king_square(white)
+        base = 6 if white else 0
+        own = self.occ[0 if white else 1]
+        occupied = self.occ[0] | self.occ[1]
+        queens = self.bb[base + QUEEN]
+        snipers = rook_attacks(king, 0) & (self.bb[base + ROOK] | queens)
+        snipers |= bishop_attacks(king, 0) & (self.bb[base + BISHOP] | queens)
+        pinned = 0
+        while snipers:
+            low = snipers & -snipers
+            snipers ^= low
+            blockers = BETWEEN[king][low.bit_length() - 1] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned |= blockers
+        return pinned
+
+    def _legal_moves(self, captures_only=False):
+        white = self.turn
+        king = self.king_square(white)
+        in_check = self.is_square_attacked(king, not white)
+        pinned = 0 if in_check else self.pinned(white)
+        occupied = self.occ[0] | self.occ[1]
+        for move in self.generate_pseudo_legal_moves(captures_only):
+            from_sq = move & 63
+            if from_sq == king:
+                # Castling already checked its path while generating
+                if move & MOVE_CASTLE or not self.is_square_attacked((move >> 6) & 63, not white, occupied ^ BB[king]):
+                    yield move
+            elif in_check or move & MOVE_EP or BB[from_sq] & pinned:
+                self.make_move(move)
+                exposed = self.is_square_attacked(king, not white)
+                self.unmake_move()
+                if not exposed:
+                    yield move
+            else:
+                yield move
+
+    def legal_moves(self, captures_only=False):
+        return list(self._legal_moves(captures_only))
+
+    def has_legal_move(self):
+        for _ in self._legal_moves():
+            return True
+        return False
+
+    def is_capture(self, move):
+        return self.board[(move >> 6) & 63] != EMPTY or bool(move & MOVE_EP)
+
+    def make_move(self, move):
+        bb, board, occ = self.bb, self.board, self.occ
+        from_sq = move & 63
+        to_sq = (move >> 6) & 63
+        piece = board[from_sq]
+        captured = board[to_sq]
+        us = 0 if self.turn else 1
+        self.stack.append((move, captured, self.castling, self.ep, self.halfmove, self.hash))
+        key = self.hash ^ self._ep_key() ^ ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_BLACK
+        key ^= ZOBRIST_PIECES[piece][from_sq] ^ ZOBRIST_PIECES[piece][to_sq]
+
+        from_to = BB[from_sq] | BB[to_sq]
+        bb[piece] ^= from_to
+        occ[us] ^= from_to
+        board[from_sq] = EMPTY
+        board[to_sq] = piece
+        if captured != EMPTY:
+            bb[captured] ^= BB[to_sq]
+            occ[1 - us] ^= BB[to_sq]
+            key ^= ZOBRIST_PIECES[captured][to_sq]
+
+        if move >= MOVE_EP:
+            if move & MOVE_EP:
+                captured_sq = to_sq - 8 if us == 0 else to_sq + 8
+                enemy_pawn = BLACK_PAWN if us == 0 else WHITE_PAWN
+                bb[enemy_pawn] ^= BB[captured_sq]
+                occ[1 - us] ^= BB[captured_sq]
+                board[captured_sq] = EMPTY
+                key ^= ZOBRIST_PIECES[enemy_pawn][captured_sq]
+            elif move & MOVE_CASTLE:
+                rook_from, rook_to = CASTLING_ROOK[to_sq]
+                rook = board[rook_from]
+                rook_from_to = BB[rook_from] | BB[rook_to]
+                bb[rook] ^= rook_from_to
+                occ[us] ^= rook_from_to
+                board[rook_from] = EMPTY
+                board[rook_to] = rook
+                key ^= ZOBRIST_PIECES[rook][rook_from] ^ ZOBRIST_PIECES[rook][rook_to]
+
+        promotion = (move >> 12) & 7
+        if promotion:
+            promoted = promotion + 6 * us
+            bb[piece] ^= BB[to_sq]
+            bb[promoted] |= BB[to_sq]
+            board[to_sq] = promoted
+            key ^= ZOBRIST_PIECES[piece][to_sq] ^ ZOBRIST_PIECES[promoted][to_sq]
+
+        self.castling &= CASTLING_MASK[from_sq] & CASTLING_MASK[to_sq]
+        self.ep = (from_sq + to_sq) >> 1 if move & MOVE_DOUBLE_PUSH else -1
+        if piece % 6 == PAWN or captured != EMPTY:
+            self.halfmove = 0
+        else:
+            self.halfmove += 1
+        if us == 1:
+            self.fullmove += 1
+        self.turn = not self.turn
+        self.hash = key ^ ZOBRIST_CASTLING[self.castling] ^ self._ep_key()
+
+    def unmake_move(self):
+        move, captured, self.castling, self.ep, self.halfmove, self.hash = self.stack.pop()
+        self.turn = not self.turn
+        bb, board, occ = self.bb, self.board, self.occ
+        from_sq = move & 63
+        to_sq = (move >> 6) & 63
+        us = 0 if self.turn else 1
+        if us == 1:
+            self.fullmove -= 1
+
+        piece = board[to_sq]
+        promotion = (move >> 12) & 7
+        if promotion:
+            bb[piece] ^= BB[to_sq]
+            piece = PAWN + 6 * us
+            bb[piece] |= BB[to_sq]
+
+        from_to = BB[from_sq] | BB[to_sq]
+        bb[piece] ^= from_to
+        occ[us] ^= from_to
+        board[from_sq] = piece
+        board[to_sq] = captured
+        if captured != EMPTY:
+            bb[captured] |= BB[to_sq]
+            occ[1 - us] |= BB[to_sq]
+
+        if move >= MOVE_EP:
+            if move & MOVE_EP:
+                captured_sq = to_sq - 8 if us == 0 else to_sq + 8
+                enemy_pawn = BLACK_PAWN if us == 0 else WHITE_PAWN
+                bb[enemy_pawn] |= BB[captured_sq]
+                occ[1 - us] |= BB[captured_sq]
+                board[captured_sq] = enemy_pawn
+            elif move & MOVE_CASTLE:
+                rook_from, rook_to = CASTLING_ROOK[to_sq]
+                rook = board[rook_to]
+                rook_from_to = BB[rook_from] | BB[rook_to]
+                bb[rook] ^= rook_from_to
+                occ[us] ^= rook_from_to
+                board[rook_to] = EMPTY
+                board[rook_from] = rook
+
+    def make_null_move(self):
+        self.stack.append((0, EMPTY, self.castling, self.ep, self.halfmove, self.hash))
+        key = self.hash ^ self._ep_key() ^ ZOBRIST_BLACK
+        self.ep = -1
+        # Repetitions are not looked for across a null move
+        self.halfmove = 0
+        self.turn = not self.turn
+        self.hash = key
+
+    def unmake_null_move(self):
+        _, _, self.castling, self.ep, self.halfmove, self.hash = self.stack.pop()
+        self.turn = not self.turn
+
+    def has_non_pawn_material(self, white):
+        base = 0 if white else 6
+        return bool(self.bb[base + KNIGHT] | self.bb[base + BISHOP] | self.bb[base + ROOK] | self.bb[base + QUEEN])
+
+    def is_checkmate(self):
+        return self.is_check() and not self.has_legal_move()
+
+    def is_insufficient_material(self):
+        bb = self.bb
+        if bb[0] | bb[3] | bb[4] | bb[6] | bb[9] | bb[10]:
+            return False
+        minors = bb[1] | bb[2] | bb[7] | bb[8]
+        return popcount(minors) <= 1
+
+    def is_repetition(self):
+        # A position can only recur with the same side to move and no capture
+        # or pawn move in between, so every other stack entry back to the
+        # last irreversible move is compared, starting four plies back
+        stack = self.stack
+        key = self.hash
+        for distance in range(4, min(self.halfmove, len(stack)) + 1, 2):
+            if stack[-distance][5] == key:
+                return True
+        return False
+
+    def is_fifty_moves(self):
+        return self.halfmove >= 100 and not self.is_checkmate()
+
+    def is_draw(self):
+        return self.is_repetition() or self.is_fifty_moves() or self.is_insufficient_material()
+
+    def parse_uci(self, uci):
+        for move in self.legal_moves():
+            if move_to_uci(move) == uci:
+                return move
+        raise ValueError(f"illegal move {uci} in {self.fen()}")
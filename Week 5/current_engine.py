@@ -1,20 +1,22 @@
-import copy
-import math
-import logging
+import argparse
+import multiprocessing
 import json
 import sys
 import chess
-import random
+import threading
+import time
 from chess import Move
+from multiprocessing import shared_memory
+from bitboard import Position, PAWN, QUEEN, EMPTY, SEE_VALUES, MOVE_EP, MOVE_CASTLE, CASTLING_ROOK, PIECE_SYMBOLS, WHITE_PAWN, BLACK_PAWN, FILE_A, RANK_2, RANK_3, RANK_6, RANK_7, ZOBRIST_PIECES, popcount, squares, move_from, move_to, move_promotion, move_to_uci
+from transposition import TranspositionTable, EXACT, LOWERBOUND, UPPERBOUND, MATE_SCORE, MATE_BOUND, INFINITY
+from opening_book import OpeningBook
+import tablebase
 
 board_positions_val_dict = {}
 visited_histories_list = []
 winning_moves = {}
-dictionary_of_positions = {}
-total_value = 0
 counter = 0
-transposition_table = {}
-zobrist_table = {}
+transposition_table = TranspositionTable(16)
 
 pst = {
     'P': (0, 0, 0, 0, 0, 0, 0, 0,
@@ -67,189 +69,892 @@ pst = {
           4, 54, 47, -99, -99, 60, 83, -62)
 }
 
+# Endgame piece-square tables, laid out like pst (a1 first)
+pst_endgame = {
+    'P': (0, 0, 0, 0, 0, 0, 0, 0,
+          13, 8, 8, 10, 13, 0, 2, -7,
+          4, 7, -6, 1, 0, -5, -1, -8,
+          13, 9, -3, -7, -7, -8, 3, -1,
+          32, 24, 13, 5, -2, 4, 17, 17,
+          94, 100, 85, 67, 56, 53, 82, 84,
+          178, 173, 158, 134, 147, 132, 165, 187,
+          0, 0, 0, 0, 0, 0, 0, 0),
+    'N': (-29, -51, -23, -15, -22, -18, -50, -64,
+          -42, -20, -10, -5, -2, -20, -23, -44,
+          -23, -3, -1, 15, 10, -3, -20, -22,
+          -18, -6, 16, 25, 16, 17, 4, -18,
+          -17, 3, 22, 22, 22, 11, 8, -18,
+          -24, -20, 10, 9, -1, -9, -19, -41,
+          -25, -8, -25, -2, -9, -25, -24, -52,
+          -58, -38, -13, -28, -31, -27, -63, -99),
+    'B': (-23, -9, -23, -5, -9, -16, -5, -17,
+          -14, -18, -7, -1, 4, -9, -15, -27,
+          -12, -3, 8, 10, 13, 3, -7, -15,
+          -6, 3, 13, 19, 7, 10, -3, -9,
+          -3, 9, 12, 9, 14, 10, 3, 2,
+          2, -8, 0, -1, -2, 6, 0, 4,
+          -8, -4, 7, -12, -3, -13, -4, -14,
+          -14, -21, -11, -8, -7, -9, -17, -24),
+    'R': (-9, 2, 3, -1, -5, -13, 4, -20,
+          -6, -6, 0, 2, -9, -9, -11, -3,
+          -4, 0, -5, -1, -7, -12, -8, -16,
+          3, 5, 8, 4, -5, -6, -8, -11,
+          4, 3, 13, 1, 2, 1, -1, 2,
+          7, 7, 7, 5, 4, -3, -5, -3,
+          11, 13, 13, 11, -3, 3, 8, 3,
+          13, 10, 18, 15, 12, 12, 8, 5),
+    'Q': (-33, -28, -22, -43, -5, -32, -20, -41,
+          -22, -23, -30, -16, -16, -23, -36, -32,
+          -16, -27, 15, 6, 9, 17, 10, 5,
+          -18, 28, 19, 47, 31, 34, 39, 23,
+          3, 22, 24, 45, 57, 40, 57, 36,
+          -20, 6, 9, 49, 47, 35, 19, 9,
+          -17, 20, 32, 41, 58, 25, 30, 0,
+          -9, 22, 22, 27, 27, 19, 10, 20),
+    'K': (-53, -34, -21, -11, -28, -14, -24, -43,
+          -27, -11, 4, 13, 14, 4, -5, -17,
+          -19, -3, 11, 21, 23, 16, 7, -9,
+          -18, -4, 21, 24, 27, 23, 9, -11,
+          -8, 22, 24, 27, 26, 33, 26, 3,
+          10, 17, 23, 15, 20, 45, 44, 13,
+          -12, 17, 14, 17, 17, 38, 23, 11,
+          -74, -35, -18, -18, -11, 15, 4, -17)
+}
+
 values = {'p': -100, 'P': 100, 'r': -479, 'R': 479, 'n': -280, 'N': 280, 'b': -320, 'B': 320, 'q': -929, 'Q': 929, 'k': -60000, 'K': 60000, '/': 0, '1': 0, '2': 0, '3': 0, '4': 0, '5': 0, '6': 0, '7': 0, '8': 0}
 
+values_endgame = {'P': 94, 'N': 281, 'B': 297, 'R': 512, 'Q': 936, 'K': 60000}
+
+# Game phase contributed by each piece type, 24 with all pieces on the board
+phase_weights = {'P': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0}
+MAX_PHASE = 24
+
+piece_square_mg = []
+piece_square_eg = []
+piece_phase = []
+mg_value = 0
+eg_value = 0
+game_phase = 0
+pawn_key = 0
+evaluation_stack = []
+
+def build_piece_square_tables():
+    # Material plus square bonus for every (piece, square), signed so that
+    # black pieces count negatively; black squares are mirrored with 63-sq
+    global piece_square_mg, piece_square_eg, piece_phase
+    piece_square_mg, piece_square_eg, piece_phase = [], [], []
+    for symbol in PIECE_SYMBOLS:
+        upper = symbol.upper()
+        sign = 1 if symbol == upper else -1
+        square_order = [sq if sign == 1 else 63 - sq for sq in range(64)]
+        piece_square_mg.append([sign * (pst[upper][square_order[sq]] + values[upper]) for sq in range(64)])
+        piece_square_eg.append([sign * (pst_endgame[upper][square_order[sq]] + values_endgame[upper]) for sq in range(64)])
+        piece_phase.append(phase_weights[upper])
+
+def initialize_evaluation(board_obj):
+    global mg_value, eg_value, game_phase, pawn_key, evaluation_stack
+    mg_value, eg_value, game_phase, pawn_key = 0, 0, 0, 0
+    evaluation_stack = []
+    for sq in range(64):
+        piece = board_obj.board[sq]
+        if piece != EMPTY:
+            mg_value += piece_square_mg[piece][sq]
+            eg_value += piece_square_eg[piece][sq]
+            game_phase += piece_phase[piece]
+            if piece == WHITE_PAWN or piece == BLACK_PAWN:
+                pawn_key ^= ZOBRIST_PIECES[piece][sq]
+
+# Pawn-structure terms, indexed by rank from the pawn's own side where it matters
+PASSED_PAWN_MG = (0, 5, 10, 15, 30, 50, 80, 0)
+PASSED_PAWN_EG = (0, 10, 15, 25, 50, 80, 120, 0)
+DOUBLED_PAWN_MG, DOUBLED_PAWN_EG = 10, 20
+ISOLATED_PAWN_MG, ISOLATED_PAWN_EG = 10, 15
+# Middlegame penalty per file in front of a castled king: own pawn on the
+# second rank, on the third, or neither
+SHELTER_PENALTY = (0, 10, 25)
+
+FILES = [FILE_A << f for f in range(8)]
+ADJACENT_FILES = [(FILES[f - 1] if f > 0 else 0) | (FILES[f + 1] if f < 7 else 0) for f in range(8)]
+# Squares in front of a pawn on its own and the adjacent files; a pawn with
+# no enemy pawns there is passed
+PASSED_MASK_WHITE = [(FILES[sq & 7] | ADJACENT_FILES[sq & 7]) & ~((1 << (8 * ((sq >> 3) + 1))) - 1) for sq in range(64)]
+PASSED_MASK_BLACK = [(FILES[sq & 7] | ADJACENT_FILES[sq & 7]) & ((1 << (8 * (sq >> 3))) - 1) for sq in range(64)]
+
+# Pawn hash: pawn-only terms cached by the pawn-only Zobrist key. Pawn
+# structure changes rarely, so almost every evaluation is a hit.
+PAWN_TABLE_SIZE = 1 << 14
+pawn_table = [None] * PAWN_TABLE_SIZE
+pawn_probes = 0
+pawn_hits = 0
+
+def shelter(own_pawns, near_rank, far_rank):
+    # Penalty for a king on each file, summed over that file and its
+    # neighbours; a king on the edge counts the three files nearest to it
+    near, far = own_pawns & near_rank, own_pawns & far_rank
+    files = [SHELTER_PENALTY[0] if near & FILES[f] else SHELTER_PENALTY[1] if far & FILES[f] else SHELTER_PENALTY[2] for f in range(8)]
+    windows = [files[f - 1] + files[f] + files[f + 1] for f in range(1, 7)]
+    return (windows[0],) + tuple(windows) + (windows[-1],)
+
+def evaluate_pawns(white_pawns, black_pawns):
+    mg, eg = 0, 0
+    for own, enemy, sign, passed_mask in ((white_pawns, black_pawns, 1, PASSED_MASK_WHITE), (black_pawns, white_pawns, -1, PASSED_MASK_BLACK)):
+        for f in range(8):
+            on_file = popcount(own & FILES[f])
+            if on_file > 1:
+                mg -= sign * DOUBLED_PAWN_MG * (on_file - 1)
+                eg -= sign * DOUBLED_PAWN_EG * (on_file - 1)
+            if on_file and not own & ADJACENT_FILES[f]:
+                mg -= sign * ISOLATED_PAWN_MG * on_file
+                eg -= sign * ISOLATED_PAWN_EG * on_file
+        for sq in squares(own):
+            if not enemy & passed_mask[sq]:
+                rank = sq >> 3 if sign == 1 else 7 - (sq >> 3)
+                mg += sign * PASSED_PAWN_MG[rank]
+                eg += sign * PASSED_PAWN_EG[rank]
+    # Shelter depends on the king file too, so every file is kept in the entry
+    return (mg, eg, shelter(white_pawns, RANK_2, RANK_3), shelter(black_pawns, RANK_7, RANK_6))
+
+def probe_pawns(board_obj):
+    global pawn_probes, pawn_hits
+    pawn_probes += 1
+    index = pawn_key & (PAWN_TABLE_SIZE - 1)
+    entry = pawn_table[index]
+    if entry is not None and entry[0] == pawn_key:
+        pawn_hits += 1
+        return entry[1]
+    terms = evaluate_pawns(board_obj.bb[WHITE_PAWN], board_obj.bb[BLACK_PAWN])
+    pawn_table[index] = (pawn_key, terms)
+    return terms
+
+def pawn_structure(board_obj, terms):
+    # Middlegame and endgame pawn terms for this position, given its pawn entry
+    pawn_mg, pawn_eg, white_shelter, black_shelter = terms
+    # Shelter only counts for a king still on its first two ranks
+    white_king = board_obj.king_square(True)
+    if white_king < 16:
+        pawn_mg -= white_shelter[white_king & 7]
+    black_king = board_obj.king_square(False)
+    if black_king >= 48:
+        pawn_mg += black_shelter[black_king & 7]
+    return pawn_mg, pawn_eg
+
 def value_for_white(board_obj):
-    return total_value
-
-moves_value = dict()
-def order_moves(board_obj, white_to_play):
-    global moves_value
-    legal_moves = board_obj.legal_moves
-    resulting_list = []
-    moves_value = {}
-    for action in legal_moves:
-        move = str(action)
-        moves_value[move] = 0
-        board_obj.push(action)
-        if board_obj.is_checkmate():
-            board_obj.pop()
-            return [action]
-        moves_value[move] = len(list(board_obj.legal_moves))
-        board_obj.pop()
-        moves_value[move] *= 1000000
-        if len(move) == 5:
-            if move[-1] == 'r' or move[-1] == "b" or move[-1] == "n":
-                continue
-            else:
-                if white_to_play:
-                    moves_value[move] -= values['Q']
-                else:
-                    moves_value[move] += values['Q']
-        resulting_list.append(action)
-        symbol = board_obj.piece_at(chess.parse_square(move[2:4]))
-        if symbol is not None:
-            if 'a' <= symbol.symbol() <= 'z':
-                moves_value[move] -= pst[symbol.symbol().upper()][63-chess.parse_square(move[2:4])] + values[symbol.symbol()]
+    phase = min(game_phase, MAX_PHASE)
+    pawn_mg, pawn_eg = pawn_structure(board_obj, probe_pawns(board_obj))
+    return ((mg_value + pawn_mg) * phase + (eg_value + pawn_eg) * (MAX_PHASE - phase)) // MAX_PHASE
+
+MAX_PLY = 64
+TT_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+PROMOTION_SCORE = 1 << 27
+KILLER_SCORE = 1 << 26
+LOSING_CAPTURE_SCORE = -(1 << 27)
+killer_moves = [[None, None] for _ in range(MAX_PLY)]
+history_table = [[0] * 64 for _ in range(12)]
+
+def static_exchange(board_obj, action):
+    # Taking a piece worth at least the capturer can never lose material,
+    # so the full exchange is only worked out for the other captures
+    victim = board_obj.board[move_to(action)]
+    attacker = board_obj.board[move_from(action)]
+    if victim != EMPTY and SEE_VALUES[victim % 6] >= SEE_VALUES[attacker % 6]:
+        return SEE_VALUES[victim % 6] - SEE_VALUES[attacker % 6]
+    return board_obj.see(action)
+
+def capture_order(board_obj, action):
+    victim = board_obj.piece_at(move_to(action))
+    attacker = board_obj.piece_at(move_from(action))
+    victim_value = abs(values[victim]) if victim is not None else values['P']
+    return -10 * victim_value + abs(values[attacker])
+
+build_piece_square_tables()
+
+def order_moves(board_obj, white_to_play, tt_move=None, ply=0):
+    # Moves are scored in stages without making them: the transposition
+    # table move, winning captures by MVV-LVA, queen promotions, killers,
+    # history, and finally captures that lose material by SEE
+    killers = killer_moves[ply] if ply < MAX_PLY else (None, None)
+    scored = []
+    for action in board_obj.legal_moves():
+        if action == tt_move:
+            score = TT_MOVE_SCORE
+        elif board_obj.is_capture(action):
+            exchange = static_exchange(board_obj, action)
+            if exchange >= 0:
+                score = CAPTURE_SCORE - capture_order(board_obj, action)
             else:
-                moves_value[move] += pst[symbol.symbol()][chess.parse_square(move[2:4])] + values[symbol.symbol()]
-    return list(sorted(resulting_list, key=lambda action: moves_value[str(action)]))
-
-def initialize_zobrist_table():
-    global zobrist_table
-    pieces = ['p', 'r', 'n', 'b', 'q', 'k', 'P', 'R', 'N', 'B', 'Q', 'K']
-    zobrist_table = {i: {piece: random.randint(0, 2**64 - 1) for piece in pieces} for i in range(64)}
-
-def compute_zobrist_hash(board_obj):
-    hash_value = 0
-    for i in range(64):
-        piece = board_obj.piece_at(i)
-        if piece:
-            hash_value ^= zobrist_table[i][piece.symbol()]
-    return hash_value
-
-def alpha_beta_pruning(board_obj, alpha, beta, max_player_flag, depth):
-    global counter, transposition_table, total_value
+                score = LOSING_CAPTURE_SCORE + exchange
+        elif move_promotion(action) == QUEEN:
+            score = PROMOTION_SCORE
+        elif move_promotion(action):
+            score = -CAPTURE_SCORE
+        elif action == killers[0]:
+            score = KILLER_SCORE
+        elif action == killers[1]:
+            score = KILLER_SCORE - 1
+        else:
+            score = history_table[board_obj.board[move_from(action)]][move_to(action)]
+        scored.append((score, action))
+    scored.sort(reverse=True)
+    return [action for _, action in scored]
+
+def update_quiet_move_stats(board_obj, action, depth, ply):
+    if board_obj.is_capture(action) or move_promotion(action):
+        return
+    if ply < MAX_PLY and killer_moves[ply][0] != action:
+        killer_moves[ply][1] = killer_moves[ply][0]
+        killer_moves[ply][0] = action
+    history_table[board_obj.board[move_from(action)]][move_to(action)] += depth * depth
+
+def reset_move_ordering():
+    for killers in killer_moves:
+        killers[0] = killers[1] = None
+    for row in history_table:
+        for sq in range(64):
+            row[sq] >>= 1
+
+DELTA_MARGIN = 200
+ASPIRATION_WINDOW = 50
+search_deadline = None
+# Past the soft deadline no new iteration is started
+soft_deadline = None
+node_limit = None
+stop_event = threading.Event()
+search_started = threading.Event()
+search_finished = threading.Event()
+pv_moves = {}
+principal_variation = []
+# Multi-PV: root moves already reported at this depth, and the finished lines
+excluded_root_moves = set()
+multi_pv = []
+
+class SearchTimeout(Exception):
+    pass
+
+# Search statistics: plain counters, cheap enough to stay on in normal play.
+# counter includes quiescence nodes; qnodes counts those alone.
+qnodes = 0
+tt_cutoffs = 0
+fail_highs = 0
+first_move_cutoffs = 0
+search_trace = []
+
+def reset_search_stats():
+    global counter, qnodes, tt_cutoffs, fail_highs, first_move_cutoffs, pawn_probes, pawn_hits, search_trace
+    counter = qnodes = tt_cutoffs = fail_highs = first_move_cutoffs = pawn_probes = pawn_hits = 0
+    transposition_table.probes = transposition_table.hits = 0
+    search_trace = []
+
+def search_totals():
+    return (counter, qnodes, transposition_table.probes, transposition_table.hits, tt_cutoffs, fail_highs, first_move_cutoffs, pawn_probes, pawn_hits)
+
+def record_iteration(depth, start_totals, iteration_time, elapsed):
+    # The counters run over the whole search; each iteration records its share
+    nodes, quiescence_nodes, probes, hits, cutoffs, highs, first_highs, pawn_lookups, pawn_found = (total - start for total, start in zip(search_totals(), start_totals))
+    previous_nodes = search_trace[-1]["nodes"] if search_trace else 0
+    entry = {
+        "depth": depth,
+        "nodes": nodes,
+        "qnodes": quiescence_nodes,
+        "ebf": nodes / previous_nodes if previous_nodes else None,
+        "first_move_cutoff_rate": first_highs / highs if highs else None,
+        "tt_probes": probes,
+        "tt_hit_rate": hits / probes if probes else None,
+        "tt_cutoff_rate": cutoffs / probes if probes else None,
+        "pawn_hit_rate": pawn_found / pawn_lookups if pawn_lookups else None,
+        "time": iteration_time,
+        "elapsed": elapsed,
+    }
+    search_trace.append(entry)
+    return entry
+
+def check_time():
+    if stop_event.is_set():
+        raise SearchTimeout()
+    if node_limit is not None and counter >= node_limit:
+        raise SearchTimeout()
+    if search_deadline is not None and time.time() > search_deadline:
+        raise SearchTimeout()
+
+def make_search_move(board_obj, action):
+    # Updates the evaluation accumulators in O(1) before making the move
+    global mg_value, eg_value, game_phase, pawn_key
+    board = board_obj.board
+    moved_from = move_from(action)
+    moved_to = move_to(action)
+    piece = board[moved_from]
+    captured = board[moved_to]
+    evaluation_stack.append((mg_value, eg_value, game_phase, pawn_key))
+    mg_value += piece_square_mg[piece][moved_to] - piece_square_mg[piece][moved_from]
+    eg_value += piece_square_eg[piece][moved_to] - piece_square_eg[piece][moved_from]
+    if piece == WHITE_PAWN or piece == BLACK_PAWN:
+        pawn_key ^= ZOBRIST_PIECES[piece][moved_from] ^ ZOBRIST_PIECES[piece][moved_to]
+    if captured != EMPTY:
+        mg_value -= piece_square_mg[captured][moved_to]
+        eg_value -= piece_square_eg[captured][moved_to]
+        game_phase -= piece_phase[captured]
+        if captured == WHITE_PAWN or captured == BLACK_PAWN:
+            pawn_key ^= ZOBRIST_PIECES[captured][moved_to]
+    if action & MOVE_EP:
+        captured_sq = moved_to - 8 if board_obj.turn else moved_to + 8
+        pawn = board[captured_sq]
+        mg_value -= piece_square_mg[pawn][captured_sq]
+        eg_value -= piece_square_eg[pawn][captured_sq]
+        pawn_key ^= ZOBRIST_PIECES[pawn][captured_sq]
+    elif action & MOVE_CASTLE:
+        rook_from, rook_to = CASTLING_ROOK[moved_to]
+        rook = board[rook_from]
+        mg_value += piece_square_mg[rook][rook_to] - piece_square_mg[rook][rook_from]
+        eg_value += piece_square_eg[rook][rook_to] - piece_square_eg[rook][rook_from]
+    promotion = move_promotion(action)
+    if promotion:
+        promoted = piece - PAWN + promotion
+        mg_value += piece_square_mg[promoted][moved_to] - piece_square_mg[piece][moved_to]
+        eg_value += piece_square_eg[promoted][moved_to] - piece_square_eg[piece][moved_to]
+        game_phase += piece_phase[promoted]
+        pawn_key ^= ZOBRIST_PIECES[piece][moved_to]
+    board_obj.make_move(action)
+
+def unmake_search_move(board_obj, action):
+    global mg_value, eg_value, game_phase, pawn_key
+    board_obj.unmake_move()
+    mg_value, eg_value, game_phase, pawn_key = evaluation_stack.pop()
+
+def evaluate(board_obj):
+    # value_for_white is from white's point of view, the search is negamax
+    value = value_for_white(board_obj)
+    return value if board_obj.turn else -value
+
+def quiescence(board_obj, alpha, beta):
+    global counter, qnodes
     counter += 1
-    
-    zobrist_hash = compute_zobrist_hash(board_obj)
-    if zobrist_hash in transposition_table:
-        entry = transposition_table[zobrist_hash]
-        if entry['depth'] >= depth:
-            if entry['flag'] == 'exact':
-                return (entry['move'], entry['value'])
-            elif entry['flag'] == 'lowerbound':
-                alpha = max(alpha, entry['value'])
-            elif entry['flag'] == 'upperbound':
-                beta = min(beta, entry['value'])
+    qnodes += 1
+    if counter & 1023 == 0:
+        check_time()
+    stand_pat = evaluate(board_obj)
+    if stand_pat >= beta:
+        return stand_pat
+    # Even winning a queen cannot lift the score back to alpha
+    if stand_pat + values['Q'] + DELTA_MARGIN < alpha:
+        return stand_pat
+    alpha = max(alpha, stand_pat)
+
+    captures = board_obj.legal_moves(captures_only=True)
+    captures.sort(key=lambda action: capture_order(board_obj, action))
+    for action in captures:
+        victim = board_obj.piece_at(move_to(action))
+        gain = abs(values[victim]) if victim is not None else values['P']
+        if move_promotion(action):
+            gain += values['Q'] - values['P']
+        if stand_pat + gain + DELTA_MARGIN < alpha:
+            continue
+        if static_exchange(board_obj, action) < 0:
+            continue
+        make_search_move(board_obj, action)
+        value = -quiescence(board_obj, -beta, -alpha)
+        unmake_search_move(board_obj, action)
+        if value > alpha:
+            alpha = value
             if alpha >= beta:
-                return (entry['move'], entry['value'])
+                break
+    return alpha
+
+# Selectivity switches, so each feature can be benchmarked on or off
+search_features = {'pvs': True, 'null_move': True, 'lmr': True}
+NULL_MOVE_MIN_DEPTH = 3
+LMR_MIN_DEPTH = 3
+LMR_FIRST_MOVE = 3
 
-    if board_obj.is_checkmate():
-        if max_player_flag:
-            return (None, -math.inf)
+def negamax(board_obj, alpha, beta, depth, ply=0, allow_null=True):
+    global counter, tt_cutoffs, fail_highs, first_move_cutoffs
+    counter += 1
+    if counter & 1023 == 0:
+        check_time()
+
+    # Draws are found from the hash history and counters alone; mate and
+    # stalemate only show up below, when there is no move to search
+    if ply >= MAX_PLY:
+        return (None, evaluate(board_obj))
+    if ply > 0:
+        if board_obj.is_draw():
+            return (None, 0)
+        # Mate-distance pruning: no line from here can beat a mate already
+        # found closer to the root
+        alpha = max(alpha, -MATE_SCORE + ply)
+        beta = min(beta, MATE_SCORE - ply - 1)
+        if alpha >= beta:
+            return (None, alpha)
+
+    # Inside tablebase range the exact result replaces the whole subtree
+    if tablebases and ply > 0 and popcount(board_obj.occ[0] | board_obj.occ[1]) <= tablebase_men:
+        result = tablebase.probe(tablebases, board_obj)
+        if result is not None:
+            outcome, distance = result
+            return (None, outcome * (MATE_SCORE - ply - distance))
+
+    # Maintained incrementally by make_move/unmake_move, including side to
+    # move, castling rights and a capturable en-passant square
+    zobrist_hash = board_obj.hash
+    entry = transposition_table.probe(zobrist_hash, ply)
+    tt_move = pv_moves.get(zobrist_hash)
+    if entry is not None:
+        entry_move, entry_value, entry_depth, entry_flag = entry
+        tt_move = entry_move or tt_move
+        if entry_depth >= depth and ply > 0:
+            if entry_flag == EXACT:
+                tt_cutoffs += 1
+                return (entry_move, entry_value)
+            elif entry_flag == LOWERBOUND:
+                alpha = max(alpha, entry_value)
+            elif entry_flag == UPPERBOUND:
+                beta = min(beta, entry_value)
+            if alpha >= beta:
+                tt_cutoffs += 1
+                return (entry_move, entry_value)
+
+    in_check = board_obj.is_check()
+    # In check the horizon is pushed back a ply, so mates at the leaves are
+    # still seen when the evasions run out
+    if depth <= 0 and not in_check:
+        return (None, quiescence(board_obj, alpha, beta))
+
+    # Null move: if passing still fails high the position is good enough to
+    # prune. Skipped in check, without pieces (zugzwang) and at the root,
+    # which has to return a move.
+    if (search_features['null_move'] and allow_null and ply > 0 and not in_check and depth >= NULL_MOVE_MIN_DEPTH
+            and abs(beta) < MATE_BOUND and board_obj.has_non_pawn_material(board_obj.turn) and evaluate(board_obj) >= beta):
+        reduction = 3 if depth > 6 else 2
+        board_obj.make_null_move()
+        _, value = negamax(board_obj, -beta, -beta + 1, depth - 1 - reduction, ply + 1, False)
+        board_obj.unmake_null_move()
+        if -value >= beta:
+            return (None, beta)
+
+    alpha_original = alpha
+    best_value = -INFINITY
+    best_move = None
+    moves = order_moves(board_obj, board_obj.turn, tt_move, ply)
+    if not moves:
+        return (None, -MATE_SCORE + ply if in_check else 0)
+    if ply == 0 and excluded_root_moves:
+        moves = [action for action in moves if action not in excluded_root_moves]
+    for index, action in enumerate(moves):
+        quiet = not board_obj.is_capture(action) and not move_promotion(action)
+        make_search_move(board_obj, action)
+        if index == 0 or not search_features['pvs']:
+            _, value = negamax(board_obj, -beta, -alpha, depth - 1, ply + 1)
+            value = -value
         else:
-            return (None, math.inf)
-    if board_obj.is_game_over():
-        return (None, 0)
-    if depth == 0:
-        return (None, total_value)
+            reduction = 0
+            if (search_features['lmr'] and ply > 0 and quiet and index >= LMR_FIRST_MOVE and depth >= LMR_MIN_DEPTH
+                    and not in_check and not board_obj.is_check()):
+                reduction = 2 if index >= 2 * LMR_FIRST_MOVE and depth > 4 else 1
+            # Zero window around alpha, widened only if the move beats it
+            _, value = negamax(board_obj, -alpha - 1, -alpha, depth - 1 - reduction, ply + 1)
+            value = -value
+            if value > alpha and reduction:
+                _, value = negamax(board_obj, -alpha - 1, -alpha, depth - 1, ply + 1)
+                value = -value
+            if alpha < value < beta:
+                _, value = negamax(board_obj, -beta, -alpha, depth - 1, ply + 1)
+                value = -value
+        unmake_search_move(board_obj, action)
+        if value > best_value or best_move is None:
+            best_value = value
+            best_move = action
+        alpha = max(alpha, best_value)
+        if alpha >= beta:
+            fail_highs += 1
+            if index == 0:
+                first_move_cutoffs += 1
+            if quiet:
+                update_quiet_move_stats(board_obj, action, depth, ply)
+            break
+    flag = UPPERBOUND if best_value <= alpha_original else LOWERBOUND if best_value >= beta else EXACT
+    # A root searched with moves left out must not overwrite the real entry
+    if ply > 0 or not excluded_root_moves:
+        transposition_table.store(zobrist_hash, best_move, best_value, depth, flag, ply)
+    return (best_move, best_value)
 
+def alpha_beta_pruning(board_obj, alpha, beta, max_player_flag, depth, ply=0):
+    # White-relative entry point kept for the callers; the search itself is
+    # negamax from the side to move
     if max_player_flag:
-        best_value = -math.inf
-        best_move = None
-        for action in order_moves(board_obj, max_player_flag):
-            move = str(action)
-            moved_from = chess.parse_square(move[0:2])
-            moved_to = chess.parse_square(move[2:4])
-            value_of_piece_captured = dictionary_of_positions[moved_to]
-            value_of_piece_moved = dictionary_of_positions[moved_from]
-            dictionary_of_positions[moved_from] = 0
-            piece_moved = board_obj.piece_at(moved_from).symbol()
-            if piece_moved.islower():
-                dictionary_of_positions[moved_to] = -pst[piece_moved.upper()][63-moved_to] + values[piece_moved]
-            else:
-                dictionary_of_positions[moved_to] = pst[piece_moved][moved_to] + values[piece_moved]
-            total_value -= value_of_piece_captured
-            # total_value += dictionary_of_positions[moved_to] - value_of_piece_moved
-            board_obj.push(action)
-            _, value = alpha_beta_pruning(board_obj, alpha, beta, not max_player_flag, depth-1)
-            if value > best_value:
-                best_value = value
-                best_move = action
-            alpha = max(alpha, best_value)
-            board_obj.pop()
-            # total_value -= dictionary_of_positions[moved_to] - value_of_piece_moved
-            total_value += value_of_piece_captured
-            dictionary_of_positions[moved_from] = value_of_piece_moved
-            dictionary_of_positions[moved_to] = value_of_piece_captured
-            if beta <= alpha:
+        return negamax(board_obj, alpha, beta, depth, ply)
+    best_move, best_value = negamax(board_obj, -beta, -alpha, depth, ply)
+    return (best_move, -best_value)
+
+def solve_alpha_beta_pruning(history_obj, alpha, beta, max_player_flag, depth=3):
+    global visited_histories_list
+    # python-chess is only used at the boundary: the search runs on bitboards
+    position = Position.from_board(history_obj)
+    transposition_table.new_search()
+    reset_move_ordering()
+    initialize_evaluation(position)
+    best_move, best_value = alpha_beta_pruning(position, alpha, beta, max_player_flag, depth)
+    if best_move is not None:
+        best_move = Move.from_uci(move_to_uci(best_move))
+    return (best_move, best_value)
+
+def extract_pv(board_obj, depth):
+    pv = []
+    for _ in range(depth):
+        entry = transposition_table.probe(board_obj.hash)
+        if entry is None or entry[0] is None or entry[0] not in board_obj.legal_moves():
+            break
+        pv.append(entry[0])
+        board_obj.make_move(entry[0])
+    for _ in pv:
+        board_obj.unmake_move()
+    return pv
+
+def search_with_aspiration(position, max_player_flag, depth, previous_value):
+    if previous_value is None or depth < 3 or abs(previous_value) >= MATE_BOUND:
+        return alpha_beta_pruning(position, -INFINITY, INFINITY, max_player_flag, depth)
+    window = ASPIRATION_WINDOW
+    alpha, beta = previous_value - window, previous_value + window
+    while True:
+        best_move, best_value = alpha_beta_pruning(position, alpha, beta, max_player_flag, depth)
+        if best_value <= alpha and alpha != -INFINITY:
+            alpha = previous_value - window * 4 if window < 400 else -INFINITY
+        elif best_value >= beta and beta != INFINITY:
+            beta = previous_value + window * 4 if window < 400 else INFINITY
+        else:
+            return (best_move, best_value)
+        window *= 4
+
+def search_other_lines(position, max_player_flag, depth, lines, best_move, best_value, pv):
+    # Each further line is the best root move once the earlier ones are left
+    # out. The searches share the transposition table, so every line after
+    # the first mostly re-reads subtrees the earlier ones already filled in.
+    global excluded_root_moves, multi_pv
+    found = [(best_move, best_value, pv)]
+    excluded_root_moves = {best_move}
+    try:
+        while len(found) < lines:
+            previous_value = multi_pv[len(found)][1] if len(found) < len(multi_pv) else None
+            move, value = search_with_aspiration(position, max_player_flag, depth, previous_value)
+            if move is None:
                 break
-        flag = 'exact' if alpha == best_value and beta == best_value else 'lowerbound' if best_value <= alpha else 'upperbound'
-        transposition_table[zobrist_hash] = {'move': best_move, 'value': best_value, 'depth': depth, 'flag': flag}
-        return (best_move, best_value)
-    else:
-        best_value = math.inf
-        best_move = None
-        for action in order_moves(board_obj, max_player_flag):
-            move = str(action)
-            moved_from = chess.parse_square(move[0:2])
-            moved_to = chess.parse_square(move[2:4])
-            value_of_piece_captured = dictionary_of_positions[moved_to]
-            value_of_piece_moved = dictionary_of_positions[moved_from]
-            dictionary_of_positions[moved_from] = 0
-            dictionary_of_positions[moved_to] = value_of_piece_moved
-            piece_moved = board_obj.piece_at(moved_from).symbol()
-            total_value -= value_of_piece_captured
-            # total_value += dictionary_of_positions[moved_to] - value_of_piece_moved
-            board_obj.push(action)
-            _, value = alpha_beta_pruning(board_obj, alpha, beta, not max_player_flag, depth-1)
-            if value < best_value:
-                best_value = value
-                best_move = action
-            beta = min(beta, best_value)
-            board_obj.pop()
-            # total_value -= dictionary_of_positions[moved_to] - value_of_piece_moved
-            total_value += value_of_piece_captured
-            dictionary_of_positions[moved_from] = value_of_piece_moved
-            dictionary_of_positions[moved_to] = value_of_piece_captured
-            if beta <= alpha:
+            position.make_move(move)
+            line = [move] + extract_pv(position, depth - 1)
+            position.unmake_move()
+            found.append((move, value, line))
+            excluded_root_moves.add(move)
+    finally:
+        excluded_root_moves = set()
+        # A timeout keeps the lines finished at this depth rather than the
+        # previous iteration's; values are white-relative, so black sorts up
+        others = sorted(found[1:], key=lambda entry: entry[1], reverse=position.turn)
+        multi_pv = found[:1] + others
+
+def iterative_deepening(history_obj, max_player_flag, max_depth=MAX_PLY, time_limit=None, nodes=None, report=None, first_depth=1, lines=1):
+    global search_deadline, soft_deadline, node_limit, pv_moves, principal_variation, multi_pv
+    reset_search_stats()
+    position = Position.from_board(history_obj)
+    transposition_table.new_search()
+    reset_move_ordering()
+    initialize_evaluation(position)
+    start_time = time.time()
+    search_deadline = start_time + time_limit if time_limit is not None else None
+    soft_deadline = start_time + time_limit / 2 if time_limit is not None else None
+    node_limit = nodes
+    best_move, best_value = None, None
+    pv_moves = {}
+    principal_variation = []
+    multi_pv = []
+    lines = min(lines, len(position.legal_moves()))
+    search_started.set()
+    try:
+        for depth in range(first_depth, max_depth + 1):
+            start_totals = search_totals()
+            iteration_start = time.time()
+            move, value = search_with_aspiration(position, max_player_flag, depth, best_value)
+            if move is None:
                 break
-        flag = 'exact' if alpha == best_value and beta == best_value else 'lowerbound' if best_value <= alpha else 'upperbound'
-        transposition_table[zobrist_hash] = {'move': best_move, 'value': best_value, 'depth': depth, 'flag': flag}
-        return (best_move, best_value)
-
-def fill_dictionary_of_positions(board_obj):
-    global dictionary_of_positions, total_value
-    total_value = 0
-    for position in range(64):
-        if board_obj.piece_at(position) is not None:
-            symbol = board_obj.piece_at(position).symbol()
-            if 'a' <= symbol <= 'z':
-                dictionary_of_positions[position] = -pst[symbol.upper()][63-position] + values[symbol]
+            best_move, best_value = move, value
+            pv = extract_pv(position, depth)
+            pv_moves = {}
+            for action in pv:
+                pv_moves[position.hash] = action
+                position.make_move(action)
+            for _ in pv:
+                position.unmake_move()
+            principal_variation = pv
+            if lines > 1:
+                search_other_lines(position, max_player_flag, depth, lines, best_move, best_value, pv)
             else:
-                dictionary_of_positions[position] = pst[symbol][position] + values[symbol]
-            total_value += dictionary_of_positions[position]
-        else:
-            dictionary_of_positions[position] = 0
+                multi_pv = [(best_move, best_value, pv)]
+            record_iteration(depth, start_totals, time.time() - iteration_start, time.time() - start_time)
+            if report is not None:
+                report(depth, best_value, counter, time.time() - start_time, pv)
+            # A mate no longer than the depth searched cannot get any shorter
+            if abs(best_value) >= MATE_BOUND and MATE_SCORE - abs(best_value) <= depth:
+                break
+            # The next iteration would not finish in the time that is left
+            if soft_deadline is not None and time.time() > soft_deadline:
+                break
+    except SearchTimeout:
+        pass
+    search_started.clear()
+    search_finished.set()
+    search_deadline = soft_deadline = None
+    node_limit = None
+    if best_move is None:
+        # A timeout leaves position mid-tree, so start again from the board
+        legal_moves = Position.from_board(history_obj).legal_moves()
+        best_move = legal_moves[0] if legal_moves else None
+    if best_move is not None:
+        best_move = Move.from_uci(move_to_uci(best_move))
+    return (best_move, best_value)
 
-def solve_alpha_beta_pruning(history_obj, alpha, beta, max_player_flag, depth=3):
-    global visited_histories_list
-    fill_dictionary_of_positions(history_obj)
-    return alpha_beta_pruning(history_obj, alpha, beta, max_player_flag, depth)
+ponder_thread = None
+ponder_result = None
 
-if __name__ == "__main__":
-    initialize_zobrist_table()
+def start_pondering(board_obj, max_depth=MAX_PLY):
+    # Searches the position after the expected reply, without a time limit,
+    # while the opponent thinks. The result carries the search's own
+    # elapsed time, since its nodes were spent before the ponder hit.
+    global ponder_thread, ponder_result
+
+    def run():
+        global ponder_result
+        start_time = time.time()
+        best_move, best_value = iterative_deepening(board_obj, board_obj.turn, max_depth)
+        ponder_result = (best_move, best_value, time.time() - start_time)
+
+    stop_event.clear()
+    search_started.clear()
+    search_finished.clear()
+    ponder_result = None
+    ponder_thread = threading.Thread(target=run, daemon=True)
+    ponder_thread.start()
+
+def ponder_hit(time_limit, thread=None):
+    # The ponder search becomes the real search: it keeps its tree and
+    # iterations and only gains a deadline, counted from now. A ponder
+    # search that already ended (a mate or its depth limit) needs none.
+    global search_deadline, soft_deadline
+    thread = thread or ponder_thread
+    while thread is not None and thread.is_alive() and not search_finished.is_set() and not search_started.wait(0.01):
+        pass
+    if time_limit is not None and search_started.is_set():
+        now = time.time()
+        soft_deadline = now + time_limit / 2
+        search_deadline = now + time_limit
+
+def finish_pondering(hit, time_limit=None):
+    global ponder_thread
+    if ponder_thread is None:
+        return None
+    if hit:
+        ponder_hit(time_limit)
+    else:
+        stop_event.set()
+    ponder_thread.join()
+    ponder_thread = None
+    stop_event.clear()
+    return ponder_result if hit else None
+
+def set_hash_size(size_mb):
+    global transposition_table
+    if transposition_table.mapping is not None:
+        transposition_table.close()
+    transposition_table = TranspositionTable(size_mb)
+
+def open_hash_file(path, size_mb, readonly=False):
+    global transposition_table
+    if transposition_table.mapping is not None:
+        transposition_table.close()
+    transposition_table = TranspositionTable.from_file(path, size_mb, readonly)
+
+opening_book = None
+tablebases = {}
+tablebase_men = 0
+
+def open_opening_book(path):
+    global opening_book
+    if opening_book is not None:
+        opening_book.close()
+    opening_book = OpeningBook(path) if path else None
+
+def load_tablebases(directory):
+    global tablebases, tablebase_men
+    for table in tablebases.values():
+        table.close()
+    tablebases = tablebase.load_directory(directory) if directory else {}
+    tablebase_men = max((len(table.pieces) + 2 for table in tablebases.values()), default=0)
+
+def book_move(board_obj, weighted=False):
+    if opening_book is None:
+        return None
+    move = opening_book.choose_move(Position.from_board(board_obj), weighted)
+    return Move.from_uci(move_to_uci(move)) if move is not None else None
+
+smp_helpers = []
+smp_tasks = None
+smp_results = None
+smp_stop = None
+smp_memory = None
+
+def smp_helper(worker_id, memory_name, tasks, results, stop):
+    global transposition_table, stop_event
+    memory = shared_memory.SharedMemory(name=memory_name)
+    transposition_table = TranspositionTable(buffer=memory.buf)
+    stop_event = stop
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        fen, max_depth, age = task
+        transposition_table.age = age
+        helper_board = chess.Board(fen)
+        # Odd helpers start one ply deeper so the workers desynchronise
+        iterative_deepening(helper_board, helper_board.turn, max_depth, first_depth=1 + worker_id % 2)
+        results.put(counter)
+    transposition_table.close()
+    memory.close()
+
+def start_smp(workers, size_mb):
+    global transposition_table, smp_tasks, smp_results, smp_stop, smp_memory
+    smp_memory = shared_memory.SharedMemory(create=True, size=size_mb * 1024 * 1024)
+    transposition_table = TranspositionTable(buffer=smp_memory.buf)
+    smp_tasks = multiprocessing.Queue()
+    smp_results = multiprocessing.Queue()
+    smp_stop = multiprocessing.Event()
+    for worker_id in range(1, workers):
+        helper = multiprocessing.Process(target=smp_helper, args=(worker_id, smp_memory.name, smp_tasks, smp_results, smp_stop), daemon=True)
+        helper.start()
+        smp_helpers.append(helper)
+
+def stop_smp():
+    global smp_helpers
+    for _ in smp_helpers:
+        smp_tasks.put(None)
+    for helper in smp_helpers:
+        helper.join()
+    smp_helpers = []
+    transposition_table.close()
+    smp_memory.close()
+    smp_memory.unlink()
+
+def smp_search(history_obj, max_depth=MAX_PLY, time_limit=None):
+    # The main process searches as worker 0; helpers search the same root and
+    # only contribute through the shared transposition table. Every process
+    # bumps the same starting age once in iterative_deepening.
+    smp_stop.clear()
+    for _ in smp_helpers:
+        smp_tasks.put((history_obj.fen(), max_depth, transposition_table.age))
+    best_move, best_value = iterative_deepening(history_obj, history_obj.turn, max_depth, time_limit)
+    smp_stop.set()
+    total_nodes = counter
+    for _ in smp_helpers:
+        total_nodes += smp_results.get()
+    return (best_move, best_value, total_nodes)
+
+SMP_BENCHMARK_FENS = [
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "rnbqkb1r/pp1p1ppp/2p5/4P3/2B5/8/PPP1NnPP/RNBQK2R w KQkq - 0 6",
+]
+
+def benchmark_smp(workers, depth, size_mb):
+    results = {}
+    for worker_count in sorted({1, workers}):
+        start_smp(worker_count, size_mb)
+        total_nodes, total_time = 0, 0.0
+        for fen in SMP_BENCHMARK_FENS:
+            transposition_table.clear()
+            start_time = time.time()
+            _, _, nodes = smp_search(chess.Board(fen), depth)
+            total_time += time.time() - start_time
+            total_nodes += nodes
+        stop_smp()
+        results[worker_count] = (total_nodes, total_time)
+        print(f"workers: {worker_count}, nodes: {total_nodes}, time to depth {depth}: {total_time:.2f}s, nps: {int(total_nodes / total_time)}")
+    single_nodes, single_time = results[1]
+    nodes, elapsed = results[workers]
+    print(f"nps speedup: {(nodes / elapsed) / (single_nodes / single_time):.2f}x, time-to-depth speedup: {single_time / elapsed:.2f}x")
+
+def play_game(args):
     initial_uci=input().strip()
     board = chess.Board()
     board.set_fen(initial_uci)
+    pondered = None
     while not board.is_game_over():
-        best_move, best_value = solve_alpha_beta_pruning(board, -math.inf, math.inf, board.turn, 6)
+        start_time = time.time()
+        best_move = None if pondered is not None else book_move(board, args.book_random)
+        expected_reply = None
+        if best_move is not None:
+            print(f"book move: {best_move}", file=sys.stderr)
+        else:
+            if pondered is not None:
+                best_move, best_value, elapsed = pondered
+                nodes = counter
+            elif args.workers > 1:
+                best_move, best_value, nodes = smp_search(board, args.depth, args.movetime)
+                elapsed = time.time() - start_time
+            else:
+                best_move, best_value = iterative_deepening(board, board.turn, args.depth, args.movetime)
+                nodes = counter
+                elapsed = time.time() - start_time
+            print(f"nodes: {nodes}, time: {elapsed:.2f}s, per node: {1e6 * elapsed / max(nodes, 1):.1f}us, nps: {int(nodes / max(elapsed, 1e-9))}", file=sys.stderr)
+            if args.trace:
+                with open(args.trace, "a") as f:
+                    f.write(json.dumps({"fen": board.fen(), "move": best_move.uci(), "nodes": nodes, "time": elapsed, "iterations": search_trace}) + "\n")
+            if len(principal_variation) > 1:
+                expected_reply = Move.from_uci(move_to_uci(principal_variation[1]))
         print(best_move)
         board.push(best_move)
+        # Think on the expected reply while the opponent does
+        if args.ponder and args.workers == 1 and expected_reply is not None and not board.is_game_over():
+            ponder_board = board.copy()
+            ponder_board.push(expected_reply)
+            if not ponder_board.is_game_over():
+                start_pondering(ponder_board, args.depth)
         opponent_mov=input().strip()
-        board.push(chess.Move.from_uci(opponent_mov))
-    # with open("mate_in_3.json", "r") as f:
-    #     mate_in_two = json.load(f)
-    # index = 0
-    # for key, value in mate_in_two.items():
-    #     board = chess.Board(key)
-    #     if board.turn == True:
-    #         continue
-    #     index += 1
-    #     best_move, best_value = solve_alpha_beta_pruning(board, -math.inf, math.inf, board.turn, 6)
-    #     print(f"Best move: {best_move}, Utility: {best_value}")
-    #     print("Number of calls: ", counter)
-    #     counter = 0
-    #     if index == 20:
-    #         break
+        opponent_move = chess.Move.from_uci(opponent_mov)
+        pondered = finish_pondering(opponent_move == expected_reply, args.movetime)
+        if pondered is not None:
+            print("ponder hit", file=sys.stderr)
+        board.push(opponent_move)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hash", type=int, default=16, help="transposition table size in MB")
+    parser.add_argument("--movetime", type=float, default=5.0, help="seconds per move")
+    parser.add_argument("--depth", type=int, default=MAX_PLY, help="maximum search depth")
+    parser.add_argument("--tt-file", help="memory-mapped transposition table file kept between runs")
+    parser.add_argument("--tt-readonly", action="store_true", help="probe --tt-file without writing to it")
+    parser.add_argument("--workers", type=int, default=1, help="number of search processes sharing the transposition table")
+    parser.add_argument("--book", help="binary opening book built by opening_book.py")
+    parser.add_argument("--book-random", action="store_true", help="pick book moves at random weighted by game count instead of the most played")
+    parser.add_argument("--tablebases", metavar="DIR", help="directory of .qtb endgame tables built by tablebase.py")
+    parser.add_argument("--ponder", action="store_true", help="search the expected reply during the opponent's turn")
+    parser.add_argument("--trace", help="append one JSON line of per-iteration search statistics per move to this file")
+    parser.add_argument("--smp-benchmark", type=int, metavar="DEPTH", help="compare --workers against one worker at a fixed depth and exit")
+    args = parser.parse_args()
+    if args.tt_file and args.workers > 1:
+        parser.error("--tt-file needs --workers 1; the helpers share an in-memory table")
+    if args.smp_benchmark:
+        benchmark_smp(args.workers, args.smp_benchmark, args.hash)
+        sys.exit(0)
+    # Loaded before the helpers fork so they share the mapped tables
+    if args.tablebases:
+        load_tablebases(args.tablebases)
+    if args.workers > 1:
+        start_smp(args.workers, args.hash)
+    elif args.tt_file:
+        open_hash_file(args.tt_file, args.hash, args.tt_readonly)
+    else:
+        set_hash_size(args.hash)
+    if args.book:
+        open_opening_book(args.book)
+    try:
+        play_game(args)
+    finally:
+        finish_pondering(False)
+        if args.workers > 1:
+            stop_smp()
+        elif args.tt_file:
+            transposition_table.close()
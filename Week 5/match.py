@@ -0,0 +1,200 @@
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import shlex
+import sys
+import time
+import chess
+import chess.engine
+from opening_book import read_fen_lines
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Played from both sides, so each opening is a fair pair of games
+DEFAULT_OPENINGS = [
+    "e2e4 e7e5 g1f3 b8c6 f1b5",
+    "e2e4 c7c5 g1f3 d7d6",
+    "e2e4 e7e6 d2d4 d7d5",
+    "e2e4 c7c6 d2d4 d7d5",
+    "d2d4 d7d5 c2c4 e7e6",
+    "d2d4 g8f6 c2c4 g7g6",
+    "d2d4 g8f6 c2c4 e7e6 g1f3",
+    "c2c4 e7e5 b1c3",
+    "g1f3 d7d5 g2g3",
+    "e2e4 d7d5 e4d5 d8d5",
+]
+
+engines = {}
+time_control = None
+max_plies = 300
+
+def load_openings(path):
+    if path is None:
+        return [(START_FEN, moves.split()) for moves in DEFAULT_OPENINGS]
+    return list(read_fen_lines(path))
+
+def init_worker(commands, directories, options, control, plies):
+    # Each worker keeps both engines running for all of its games
+    global time_control, max_plies
+    for name in ('a', 'b'):
+        engines[name] = chess.engine.SimpleEngine.popen_uci(commands[name], cwd=directories[name])
+        if options[name]:
+            engines[name].configure(options[name])
+    time_control, max_plies = control, plies
+
+def limit_for(clocks):
+    base, increment, movetime = time_control
+    if movetime is not None:
+        return chess.engine.Limit(time=movetime)
+    return chess.engine.Limit(white_clock=clocks[chess.WHITE], black_clock=clocks[chess.BLACK], white_inc=increment, black_inc=increment)
+
+def play_game(task):
+    # Returns the score of engine a: 1, 0.5 or 0
+    index, (fen, moves), a_is_white = task
+    board = chess.Board(fen)
+    for uci in moves:
+        board.push_uci(uci)
+    players = {chess.WHITE: 'a' if a_is_white else 'b', chess.BLACK: 'b' if a_is_white else 'a'}
+    base, increment, _ = time_control
+    clocks = {chess.WHITE: base, chess.BLACK: base}
+    reason = None
+    winner = None
+    while reason is None:
+        outcome = board.outcome(claim_draw=True)
+        if outcome is not None:
+            reason, winner = outcome.termination.name.lower(), outcome.winner
+            break
+        if len(board.move_stack) >= max_plies:
+            reason = "max_plies"
+            break
+        side = board.turn
+        start_time = time.time()
+        try:
+            result = engines[players[side]].play(board, limit_for(clocks), game=index)
+        except chess.engine.EngineError:
+            reason, winner = "engine_error", not side
+            break
+        if time_control[2] is None:
+            clocks[side] -= time.time() - start_time
+            if clocks[side] < 0:
+                reason, winner = "time_forfeit", not side
+                break
+            clocks[side] += increment
+        if result.move is None or result.move not in board.legal_moves:
+            reason, winner = "illegal_move", not side
+            break
+        board.push(result.move)
+    if winner is None:
+        score = 0.5
+    else:
+        score = 1.0 if players[winner] == 'a' else 0.0
+    return {"index": index, "opening": fen if not moves else ' '.join(moves), "a_white": a_is_white, "score": score, "reason": reason, "plies": len(board.move_stack)}
+
+def elo_to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    # Trinomial GSPRT log-likelihood ratio in the normal approximation
+    games = wins + draws + losses
+    if games == 0 or wins + losses == 0:
+        return 0.0
+    mean = (wins + draws / 2) / games
+    variance = (wins * (1 - mean) ** 2 + draws * (0.5 - mean) ** 2 + losses * mean ** 2) / games
+    if variance <= 0:
+        return 0.0
+    score0, score1 = elo_to_score(elo0), elo_to_score(elo1)
+    return games * (score1 - score0) * (2 * mean - score0 - score1) / (2 * variance)
+
+def elo_estimate(wins, draws, losses):
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games if games else 0.5
+    score = min(max(score, 1e-3), 1 - 1e-3)
+    return -400 * math.log10(1 / score - 1)
+
+def run_match(openings, games, workers, commands, directories, options, control, plies=max_plies, elo0=0.0, elo1=5.0, alpha=0.05, beta=0.05, verbose=False):
+    lower, upper = math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+    tasks = ((index, opening, index % 2 == 0) for index, opening in enumerate(itertools.islice(
+        (opening for opening in itertools.cycle(openings) for _ in range(2)), games)))
+    wins = draws = losses = 0
+    llr = 0.0
+    verdict = None
+    start_time = time.time()
+    pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(commands, directories, options, control, plies))
+    try:
+        for result in pool.imap_unordered(play_game, tasks):
+            if result["score"] == 1.0:
+                wins += 1
+            elif result["score"] == 0.0:
+                losses += 1
+            else:
+                draws += 1
+            llr = sprt_llr(wins, draws, losses, elo0, elo1)
+            if verbose:
+                print(json.dumps(result), file=sys.stderr)
+            print(f"games {wins + draws + losses}: +{wins} ={draws} -{losses}, elo {elo_estimate(wins, draws, losses):+.1f}, llr {llr:.2f} ({lower:.2f}, {upper:.2f})", file=sys.stderr)
+            if llr >= upper:
+                verdict = "H1"
+                break
+            if llr <= lower:
+                verdict = "H0"
+                break
+    finally:
+        pool.terminate()
+        pool.join()
+    return {
+        "games": wins + draws + losses,
+        "wins": wins,
+        "draws": draws,
+        "losses": losses,
+        "elo": elo_estimate(wins, draws, losses),
+        "llr": llr,
+        "bounds": [lower, upper],
+        "sprt": {"elo0": elo0, "elo1": elo1, "alpha": alpha, "beta": beta},
+        "verdict": verdict or "inconclusive",
+        "time": time.time() - start_time,
+    }
+
+def parse_options(pairs):
+    options = {}
+    for pair in pairs:
+        name, _, value = pair.partition('=')
+        options[name] = value
+    return options
+
+def parse_time_control(text):
+    base, _, increment = text.partition('+')
+    return float(base), float(increment or 0)
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    default_command = f"{shlex.quote(sys.executable)} uci.py"
+    parser = argparse.ArgumentParser(description="Play two UCI engine builds against each other and stop once an SPRT decides")
+    parser.add_argument("--engine-a", default=default_command, help="command for the engine under test")
+    parser.add_argument("--engine-b", default=default_command, help="command for the baseline engine")
+    parser.add_argument("--dir-a", default=here, help="working directory for engine a, e.g. a git worktree of the new build")
+    parser.add_argument("--dir-b", default=here, help="working directory for engine b")
+    parser.add_argument("--option-a", nargs="*", default=[], metavar="NAME=VALUE", help="UCI options for engine a")
+    parser.add_argument("--option-b", nargs="*", default=[], metavar="NAME=VALUE", help="UCI options for engine b")
+    parser.add_argument("--openings", help="file of '<fen|startpos> moves <uci> ...' lines (default: a small built-in suite)")
+    parser.add_argument("--games", type=int, default=1000, help="maximum number of games")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="games played at once; each runs two engines")
+    parser.add_argument("--tc", default="10+0.1", help="time control per game as BASE+INCREMENT seconds")
+    parser.add_argument("--movetime", type=float, help="fixed seconds per move instead of a clock")
+    parser.add_argument("--max-plies", type=int, default=max_plies, help="adjudicate a draw after this many plies")
+    parser.add_argument("--elo0", type=float, default=0.0, help="SPRT null hypothesis Elo")
+    parser.add_argument("--elo1", type=float, default=5.0, help="SPRT alternative hypothesis Elo")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--verbose", action="store_true", help="print one JSON line per game to stderr")
+    args = parser.parse_args()
+    base, increment = parse_time_control(args.tc)
+    report = run_match(
+        load_openings(args.openings), args.games, args.workers,
+        {'a': shlex.split(args.engine_a), 'b': shlex.split(args.engine_b)},
+        {'a': args.dir_a, 'b': args.dir_b},
+        {'a': parse_options(args.option_a), 'b': parse_options(args.option_b)},
+        (base, increment, args.movetime), args.max_plies, args.elo0, args.elo1, args.alpha, args.beta, args.verbose)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,135 @@
+import argparse
+import mmap
+import random
+import struct
+from bitboard import Position, ZOBRIST_SIGNATURE, move_to_uci
+
+BOOK_MAGIC = b'QGBK'
+BOOK_VERSION = 1
+BOOK_HEADER = struct.Struct('<4sIQQ')
+# One entry per (position, move): Zobrist key, move, number of games
+BOOK_ENTRY = struct.Struct('<QII')
+
+def read_fen_lines(path):
+    # One line per game fragment, written like a UCI position command:
+    # "<fen> [moves <uci> <uci> ...]" or "startpos [moves ...]"
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            setup, _, moves = line.partition(' moves ')
+            if setup.endswith(' moves'):
+                setup = setup[:-len(' moves')]
+            if setup == 'startpos':
+                setup = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+            yield setup, moves.split()
+
+def read_pgn_games(path):
+    import chess.pgn
+    with open(path, "r", errors="replace") as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            yield game.board().fen(), [move.uci() for move in game.mainline_moves()]
+
+def collect_counts(sources, max_plies):
+    counts = {}
+    for setup, moves in sources:
+        position = Position.from_fen(setup)
+        for uci in moves[:max_plies]:
+            try:
+                move = position.parse_uci(uci)
+            except ValueError:
+                break
+            entry = (position.hash, move)
+            counts[entry] = counts.get(entry, 0) + 1
+            position.make_move(move)
+    return counts
+
+def write_book(path, counts, min_count=1):
+    entries = sorted((key, move, count) for (key, move), count in counts.items() if count >= min_count)
+    with open(path, "wb") as f:
+        f.write(BOOK_HEADER.pack(BOOK_MAGIC, BOOK_VERSION, ZOBRIST_SIGNATURE, len(entries)))
+        for key, move, count in entries:
+            f.write(BOOK_ENTRY.pack(key, move, min(count, 0xFFFFFFFF)))
+    return len(entries)
+
+def build_book(output, inputs, max_plies=20, min_count=1):
+    sources = []
+    for path in inputs:
+        if path.lower().endswith('.pgn'):
+            sources.append(read_pgn_games(path))
+        else:
+            sources.append(read_fen_lines(path))
+    counts = {}
+    for source in sources:
+        for entry, count in collect_counts(source, max_plies).items():
+            counts[entry] = counts.get(entry, 0) + count
+    return write_book(output, counts, min_count)
+
+class OpeningBook:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.mapping = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, signature, self.count = BOOK_HEADER.unpack_from(self.mapping, 0)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION or signature != ZOBRIST_SIGNATURE:
+            self.close()
+            raise ValueError(f"{path} is not an opening book for this key schedule")
+
+    def close(self):
+        self.mapping.close()
+        self.file.close()
+
+    def key_at(self, index):
+        return struct.unpack_from('<Q', self.mapping, BOOK_HEADER.size + index * BOOK_ENTRY.size)[0]
+
+    def entries(self, key):
+        # Binary search for the first entry with this key, then read the run
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        result = []
+        while low < self.count:
+            entry_key, move, count = BOOK_ENTRY.unpack_from(self.mapping, BOOK_HEADER.size + low * BOOK_ENTRY.size)
+            if entry_key != key:
+                break
+            result.append((move, count))
+            low += 1
+        return result
+
+    def choose_move(self, position, weighted=False):
+        legal = set(position.legal_moves())
+        candidates = [(move, count) for move, count in self.entries(position.hash) if move in legal]
+        if not candidates:
+            return None
+        if weighted:
+            return random.choices([move for move, _ in candidates], weights=[count for _, count in candidates])[0]
+        return max(candidates, key=lambda candidate: candidate[1])[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the binary opening book")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a book from PGN files or FEN-move files")
+    build.add_argument("output")
+    build.add_argument("inputs", nargs="+", help=".pgn files, or text files of '<fen|startpos> moves <uci> ...' lines")
+    build.add_argument("--plies", type=int, default=20, help="only record the first PLIES moves of each game")
+    build.add_argument("--min-count", type=int, default=1, help="drop moves played fewer times than this")
+    probe = commands.add_parser("probe", help="list the book moves for a position")
+    probe.add_argument("book")
+    probe.add_argument("--fen", default="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+    args = parser.parse_args()
+    if args.command == "build":
+        written = build_book(args.output, args.inputs, args.plies, args.min_count)
+        print(f"wrote {written} entries to {args.output}")
+    else:
+        book = OpeningBook(args.book)
+        position = Position.from_fen(args.fen)
+        for move, count in sorted(book.entries(position.hash), key=lambda entry: -entry[1]):
+            print(move_to_uci(move), count)
+        book.close()
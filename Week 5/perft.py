@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import sys
+import time
+from bitboard import Position, move_to_uci
+
+# Standard perft positions with published node counts per depth
+PERFT_SUITE = [
+    ("startpos", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862, 4085603]),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890, 3894594]),
+]
+
+PUZZLE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Week 3")
+
+def perft(position, depth, bulk=True):
+    if depth == 0:
+        return 1
+    moves = position.legal_moves()
+    # Bulk counting: the leaves are exactly the legal moves one ply up
+    if bulk and depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        position.make_move(move)
+        nodes += perft(position, depth - 1, bulk)
+        position.unmake_move()
+    return nodes
+
+def divide(position, depth, bulk=True):
+    counts = {}
+    for move in position.legal_moves():
+        position.make_move(move)
+        counts[move_to_uci(move)] = perft(position, depth - 1, bulk)
+        position.unmake_move()
+    return counts
+
+def reference_perft(board, depth):
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return board.legal_moves.count()
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += reference_perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+def load_puzzle_positions(limit):
+    positions = []
+    for mate_length in (2, 3, 4):
+        path = os.path.join(PUZZLE_DIRECTORY, f"mate_in_{mate_length}.json")
+        with open(path, "r") as f:
+            fens = list(json.load(f))
+        positions.extend((f"mate_in_{mate_length}[{i}]", fen, None) for i, fen in enumerate(fens[:limit]))
+    return positions
+
+def run_suite(positions, depth, bulk=True, use_reference=False):
+    results = []
+    total_nodes, total_time, failures = 0, 0.0, 0
+    for name, fen, known in positions:
+        position = Position.from_fen(fen)
+        expected = known[depth - 1] if known is not None and depth <= len(known) else None
+        if expected is None and use_reference:
+            import chess
+            expected = reference_perft(chess.Board(fen), depth)
+        start_time = time.time()
+        nodes = perft(position, depth, bulk)
+        elapsed = time.time() - start_time
+        ok = expected is None or nodes == expected
+        failures += not ok
+        total_nodes += nodes
+        total_time += elapsed
+        results.append({"name": name, "fen": fen, "depth": depth, "nodes": nodes, "expected": expected, "ok": ok, "time": elapsed, "nps": int(nodes / elapsed) if elapsed > 0 else 0})
+    summary = {"positions": len(results), "failures": failures, "nodes": total_nodes, "time": total_time, "nps": int(total_nodes / total_time) if total_time > 0 else 0, "bulk": bulk}
+    return results, summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perft correctness and speed suite for the bitboard move generator")
+    parser.add_argument("--depth", type=int, default=3, help="perft depth")
+    parser.add_argument("--divide", metavar="FEN", help="print per-move node counts for one position and exit")
+    parser.add_argument("--puzzles", type=int, default=0, metavar="N", help="also run the first N positions of each Week 3 mate_in_N.json file")
+    parser.add_argument("--reference", action="store_true", help="check positions without known counts against python-chess")
+    parser.add_argument("--no-bulk", action="store_true", help="make every leaf move instead of counting them at the last ply")
+    args = parser.parse_args()
+    bulk = not args.no_bulk
+    if args.divide:
+        counts = divide(Position.from_fen(args.divide), args.depth, bulk)
+        for uci in sorted(counts):
+            print(f"{uci}: {counts[uci]}")
+        print(f"\nMoves: {len(counts)}\nNodes: {sum(counts.values())}")
+        sys.exit(0)
+    positions = list(PERFT_SUITE)
+    if args.puzzles:
+        positions += load_puzzle_positions(args.puzzles)
+    results, summary = run_suite(positions, args.depth, bulk, args.reference)
+    for result in results:
+        print(json.dumps(result))
+    print(json.dumps(summary))
+    sys.exit(1 if summary["failures"] else 0)
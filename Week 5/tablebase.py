@@ -0,0 +1,398 @@
+import argparse
+import itertools
+import mmap
+import os
+import struct
+import sys
+import time
+from bitboard import (Position, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, WHITE_KING, BLACK_KING, BB, PIECE_SYMBOLS,
+                      KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, rook_attacks, bishop_attacks, popcount, squares)
+
+# Tables cover one strong side against a bare king. Positions are stored
+# with white as the strong side; a black strong side is probed mirrored.
+TABLEBASE_MAGIC = b'QGTB'
+TABLEBASE_VERSION = 2
+TABLEBASE_HEADER = struct.Struct('<4sI8sBQ')
+TABLEBASE_EXTENSION = '.qtb'
+
+# Strong pieces are indexed in this order so a material set has one layout
+PIECE_ORDER = (QUEEN, ROOK, BISHOP, KNIGHT, PAWN)
+PROMOTIONS = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+def canonical(pieces):
+    return tuple(sorted(pieces, key=PIECE_ORDER.index))
+
+def table_name(pieces):
+    return 'K' + ''.join(PIECE_SYMBOLS[piece] for piece in pieces) + 'K'
+
+def parse_name(name):
+    name = name.upper()
+    if len(name) < 2 or name[0] != 'K' or name[-1] != 'K' or any(symbol not in 'QRBNP' for symbol in name[1:-1]):
+        raise ValueError(f"{name} is not a strong-side-versus-bare-king material set like KQK or KBNK")
+    return canonical(PIECE_SYMBOLS.index(symbol) for symbol in name[1:-1])
+
+def is_trivial_draw(pieces):
+    return not pieces or pieces in ((BISHOP,), (KNIGHT,))
+
+def canonical_squares(wk, bk, piece_squares, pawns):
+    # Uses the board's symmetries to put the white king on files a-d and,
+    # without pawns, in the a1-d1-d4 triangle. While everything so far is on
+    # the a1-h8 diagonal, the first piece off it decides the reflection, so
+    # every position has exactly one representative.
+    board_squares = [wk, bk] + list(piece_squares)
+    if wk & 7 > 3:
+        board_squares = [sq ^ 7 for sq in board_squares]
+    if not pawns:
+        if board_squares[0] >> 3 > 3:
+            board_squares = [sq ^ 56 for sq in board_squares]
+        for sq in board_squares:
+            if sq >> 3 != sq & 7:
+                if sq >> 3 > sq & 7:
+                    board_squares = [(sq & 7) << 3 | sq >> 3 for sq in board_squares]
+                break
+    return board_squares[0], board_squares[1], board_squares[2:]
+
+def king_pairs(pawns):
+    pairs = []
+    for wk in range(64):
+        if wk & 7 > 3 or (not pawns and (wk >> 3 > 3 or wk >> 3 > wk & 7)):
+            continue
+        for bk in range(64):
+            if wk == bk or KING_ATTACKS[wk] & BB[bk]:
+                continue
+            if not pawns and wk >> 3 == wk & 7 and bk >> 3 > bk & 7:
+                continue
+            pairs.append((wk, bk))
+    return pairs
+
+# 462 king pairs without pawns, 1806 with them (only the left-right mirror)
+def king_pair_index(pairs):
+    index = [-1] * 4096
+    for pair, (wk, bk) in enumerate(pairs):
+        index[wk * 64 + bk] = pair
+    return index
+
+KING_PAIRS = {False: king_pairs(False), True: king_pairs(True)}
+KING_PAIR_INDEX = {pawns: king_pair_index(pairs) for pawns, pairs in KING_PAIRS.items()}
+
+def table_size(pieces):
+    return 2 * len(KING_PAIRS[PAWN in pieces]) * 64 ** len(pieces)
+
+def raw_index(pair, piece_squares, black_to_move):
+    index = pair
+    for sq in piece_squares:
+        index = index * 64 + sq
+    return index * 2 + black_to_move
+
+def table_index(wk, bk, piece_squares, black_to_move, pawns):
+    wk, bk, piece_squares = canonical_squares(wk, bk, piece_squares, pawns)
+    return raw_index(KING_PAIR_INDEX[pawns][wk * 64 + bk], piece_squares, black_to_move)
+
+def decode_index(index, count, pawns):
+    black_to_move = index & 1
+    index >>= 1
+    piece_squares = [0] * count
+    for i in range(count - 1, -1, -1):
+        index, piece_squares[i] = divmod(index, 64)
+    wk, bk = KING_PAIRS[pawns][index]
+    return wk, bk, piece_squares, black_to_move
+
+def white_attacks(wk, pieces, piece_squares, occupied):
+    attacks = KING_ATTACKS[wk]
+    for piece, sq in zip(pieces, piece_squares):
+        if piece == KNIGHT:
+            attacks |= KNIGHT_ATTACKS[sq]
+        elif piece == PAWN:
+            attacks |= PAWN_ATTACKS[0][sq]
+        else:
+            if piece != BISHOP:
+                attacks |= rook_attacks(sq, occupied)
+            if piece != ROOK:
+                attacks |= bishop_attacks(sq, occupied)
+    return attacks
+
+def pack(values, bits):
+    # Little-endian bit stream, one spare byte so a read never runs off the end
+    data = bytearray((len(values) * bits + 7) // 8 + 1)
+    for index, value in enumerate(values):
+        if value:
+            position = index * bits
+            word = value << (position & 7)
+            data[position >> 3] |= word & 0xFF
+            data[(position >> 3) + 1] |= word >> 8
+    return data
+
+class Tablebase:
+    # Each entry is the distance to mate in plies plus one, 0 for a draw.
+    # Entries with white to move are wins for white, entries with black to
+    # move are losses for black: a bare king can never win.
+    def __init__(self, pieces, bits, data, mapping=None, file=None):
+        self.pieces = pieces
+        self.pawns = PAWN in pieces
+        self.name = table_name(pieces)
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        self.data = data
+        self.mapping = mapping
+        self.file = file
+
+    @classmethod
+    def from_file(cls, path):
+        f = open(path, 'rb')
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, name, bits, entries = TABLEBASE_HEADER.unpack_from(mapping, 0)
+        if magic != TABLEBASE_MAGIC or version != TABLEBASE_VERSION:
+            mapping.close()
+            f.close()
+            raise ValueError(f"{path} is not a tablebase file")
+        pieces = parse_name(name.rstrip(b'\0').decode())
+        if entries != table_size(pieces):
+            mapping.close()
+            f.close()
+            raise ValueError(f"{path} has the wrong number of entries")
+        return cls(pieces, bits, memoryview(mapping)[TABLEBASE_HEADER.size:], mapping, f)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(TABLEBASE_HEADER.pack(TABLEBASE_MAGIC, TABLEBASE_VERSION, self.name.encode(), self.bits, table_size(self.pieces)))
+            f.write(self.data)
+
+    def close(self):
+        if self.mapping is not None:
+            self.data.release()
+            self.mapping.close()
+            self.file.close()
+
+    def value(self, index):
+        position = index * self.bits
+        word = self.data[position >> 3] | self.data[(position >> 3) + 1] << 8
+        return (word >> (position & 7)) & self.mask
+
+    def lookup(self, wk, bk, placed, black_to_move):
+        # placed holds (piece, square) pairs in any order
+        piece_squares = [sq for _, sq in sorted(placed, key=lambda entry: PIECE_ORDER.index(entry[0]))]
+        return self.value(table_index(wk, bk, piece_squares, black_to_move, self.pawns))
+
+def load_or_generate(pieces, directory, tables, verbose=False):
+    if is_trivial_draw(pieces):
+        return None
+    name = table_name(pieces)
+    if name not in tables:
+        path = os.path.join(directory, name + TABLEBASE_EXTENSION)
+        if os.path.exists(path):
+            tables[name] = Tablebase.from_file(path)
+        else:
+            tables[name] = generate(pieces, directory, tables, verbose)
+            tables[name].save(path)
+    return tables[name]
+
+def sub_value(table, wk, bk, placed, black_to_move):
+    if table is None:
+        return 0
+    return table.lookup(wk, bk, placed, black_to_move)
+
+def generate(pieces, directory, tables, verbose=False):
+    # Retrograde analysis: seed mates and exits into smaller tables, then walk
+    # backwards one ply at a time. A white position is won once any move
+    # reaches a lost black position; a black position is lost once all of
+    # its escapes are won for white, which is checked again each time one of
+    # them is decided (a counter would miscount under the board symmetries).
+    start_time = time.time()
+    count = len(pieces)
+    pawns = PAWN in pieces
+    size = table_size(pieces)
+    result = bytearray(size)
+    # Lowest level each entry is queued at, plus one, so no level holds duplicates
+    queued = bytearray(size)
+    levels = []
+
+    def schedule(index, level):
+        if result[index] or (queued[index] and queued[index] <= level + 1):
+            return
+        queued[index] = level + 1
+        while len(levels) <= level:
+            levels.append([])
+        levels[level].append(index)
+
+    capture_tables = [load_or_generate(canonical(pieces[:j] + pieces[j + 1:]), directory, tables, verbose) for j in range(count)]
+    promotion_tables = {}
+    for j in range(count):
+        if pieces[j] == PAWN:
+            for promotion in PROMOTIONS:
+                promotion_tables[j, promotion] = load_or_generate(canonical(pieces[:j] + (promotion,) + pieces[j + 1:]), directory, tables, verbose)
+
+    def black_level(wk, bk, piece_squares, occupied, attacks):
+        # The level a black-to-move position is lost at, one past its slowest
+        # escape, or None while an escape is undecided or drawn
+        escapes = KING_ATTACKS[bk] & ~attacks
+        if not escapes:
+            return 0 if attacks & BB[bk] else None
+        slowest = 0
+        for sq in squares(escapes):
+            if occupied & BB[sq]:
+                j = piece_squares.index(sq)
+                placed = [(pieces[i], piece_squares[i]) for i in range(count) if i != j]
+                value = sub_value(capture_tables[j], wk, sq, placed, 0)
+            else:
+                value = result[table_index(wk, sq, piece_squares, 0, pawns)]
+            if not value:
+                return None
+            slowest = max(slowest, value)
+        return slowest
+
+    for pair, (wk, bk) in enumerate(KING_PAIRS[pawns]):
+        for piece_squares in itertools.product(range(64), repeat=count):
+            occupied = BB[wk] | BB[bk]
+            legal = True
+            for piece, sq in zip(pieces, piece_squares):
+                if occupied & BB[sq] or (piece == PAWN and (sq < 8 or sq >= 56)):
+                    legal = False
+                    break
+                occupied |= BB[sq]
+            if not legal:
+                continue
+            piece_squares = list(piece_squares)
+            index = raw_index(pair, piece_squares, 0)
+            attacks = white_attacks(wk, pieces, piece_squares, occupied ^ BB[bk])
+
+            # Mates, and positions whose every escape is a capture, are
+            # decided by the smaller tables alone
+            if not KING_ATTACKS[bk] & ~attacks & ~occupied:
+                level = black_level(wk, bk, piece_squares, occupied, attacks)
+                if level is not None:
+                    schedule(index + 1, level)
+
+            if attacks & BB[bk]:
+                continue
+            for j in range(count):
+                sq = piece_squares[j]
+                if pieces[j] != PAWN or sq < 48 or occupied & BB[sq + 8]:
+                    continue
+                placed = [(pieces[i], piece_squares[i]) for i in range(count) if i != j]
+                for promotion in PROMOTIONS:
+                    value = sub_value(promotion_tables[j, promotion], wk, bk, placed + [(promotion, sq + 8)], 1)
+                    if value:
+                        schedule(index, value)
+
+    level = 0
+    while level < len(levels):
+        for index in levels[level]:
+            if result[index]:
+                continue
+            result[index] = level + 1
+            wk, bk, piece_squares, black_to_move = decode_index(index, count, pawns)
+            occupied = BB[wk] | BB[bk]
+            for sq in piece_squares:
+                occupied |= BB[sq]
+            if black_to_move:
+                # Every white move that could have led here wins
+                predecessors = []
+                for sq in squares(KING_ATTACKS[wk] & ~occupied & ~KING_ATTACKS[bk]):
+                    predecessors.append((sq, piece_squares))
+                for j in range(count):
+                    sq, piece = piece_squares[j], pieces[j]
+                    if piece == KNIGHT:
+                        sources = squares(KNIGHT_ATTACKS[sq] & ~occupied)
+                    elif piece == PAWN:
+                        sources = []
+                        if sq >= 16 and not occupied & BB[sq - 8]:
+                            sources.append(sq - 8)
+                            if 24 <= sq < 32 and not occupied & BB[sq - 16]:
+                                sources.append(sq - 16)
+                    else:
+                        attacks = 0
+                        if piece != BISHOP:
+                            attacks |= rook_attacks(sq, occupied)
+                        if piece != ROOK:
+                            attacks |= bishop_attacks(sq, occupied)
+                        sources = squares(attacks & ~occupied)
+                    for source in sources:
+                        predecessors.append((wk, piece_squares[:j] + [source] + piece_squares[j + 1:]))
+                for king, previous in predecessors:
+                    previous_index = table_index(king, bk, previous, 0, pawns)
+                    if result[previous_index]:
+                        continue
+                    previous_occupied = BB[king] | BB[bk]
+                    for sq in previous:
+                        previous_occupied |= BB[sq]
+                    if not white_attacks(king, pieces, previous, previous_occupied) & BB[bk]:
+                        schedule(previous_index, level + 1)
+            else:
+                # Black king moves into this won position may have been the
+                # last escape left
+                attacks = white_attacks(wk, pieces, piece_squares, occupied ^ BB[bk])
+                for sq in squares(KING_ATTACKS[bk] & ~occupied & ~KING_ATTACKS[wk]):
+                    previous_index = table_index(wk, sq, piece_squares, 1, pawns)
+                    if result[previous_index] or queued[previous_index]:
+                        continue
+                    previous_occupied = occupied ^ BB[bk] | BB[sq]
+                    black = black_level(wk, sq, piece_squares, previous_occupied, attacks)
+                    if black is not None:
+                        schedule(previous_index, black)
+        levels[level] = None
+        level += 1
+
+    bits = max(1, max(result).bit_length())
+    if verbose:
+        print(f"{table_name(pieces)}: longest mate {max(result) - 1} plies, {bits} bits per entry, {time.time() - start_time:.1f}s", file=sys.stderr)
+    return Tablebase(pieces, bits, pack(result, bits))
+
+def load_directory(directory):
+    tables = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(TABLEBASE_EXTENSION):
+            table = Tablebase.from_file(os.path.join(directory, filename))
+            tables[table.name] = table
+    return tables
+
+def probe(tables, position):
+    # Returns (1, plies) when the side to move mates, (-1, plies) when it is
+    # mated, (0, 0) for a draw and None when no table covers the position
+    if position.castling:
+        return None
+    white, black = position.occ
+    if black == position.bb[BLACK_KING]:
+        strong_white, base, flip = True, 0, 0
+    elif white == position.bb[WHITE_KING]:
+        strong_white, base, flip = False, 6, 56
+    else:
+        return None
+    king = base + 5
+    placed = [(position.board[sq] - base, sq ^ flip) for sq in squares((white if strong_white else black) & ~position.bb[king])]
+    pieces = canonical(piece for piece, _ in placed)
+    if is_trivial_draw(pieces):
+        return (0, 0)
+    table = tables.get(table_name(pieces))
+    if table is None:
+        return None
+    strong_to_move = position.turn == strong_white
+    wk = position.king_square(strong_white) ^ flip
+    bk = position.king_square(not strong_white) ^ flip
+    value = table.lookup(wk, bk, placed, 0 if strong_to_move else 1)
+    if not value:
+        return (0, 0)
+    return (1 if strong_to_move else -1, value - 1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate or probe endgame tablebases for a strong side against a bare king")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("generate", help="generate tables (and the smaller tables they depend on)")
+    build.add_argument("names", nargs="+", help="material sets such as KQK KRK KPK KBNK")
+    build.add_argument("--dir", default="tablebases", help="directory holding the .qtb files")
+    lookup = commands.add_parser("probe", help="look a position up")
+    lookup.add_argument("fen")
+    lookup.add_argument("--dir", default="tablebases", help="directory holding the .qtb files")
+    args = parser.parse_args()
+    if args.command == "generate":
+        os.makedirs(args.dir, exist_ok=True)
+        tables = {}
+        for name in args.names:
+            load_or_generate(parse_name(name), args.dir, tables, verbose=True)
+    else:
+        result = probe(load_directory(args.dir), Position.from_fen(args.fen))
+        if result is None:
+            print("not in the tablebases")
+        elif result[0] == 0:
+            print("draw")
+        else:
+            print(f"side to move {'wins' if result[0] > 0 else 'loses'}, mate in {result[1]} plies")
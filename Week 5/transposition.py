@@ -0,0 +1,166 @@
+import mmap
+import os
+import struct
+from bitboard import ZOBRIST_SIGNATURE
+
+EXACT, LOWERBOUND, UPPERBOUND = 1, 2, 3
+
+# Scores are integers. A mate is MATE_SCORE less the plies from the root to
+# it, so anything beyond MATE_BOUND is a mate (tablebase mates included).
+MATE_SCORE = 1000000
+MATE_BOUND = MATE_SCORE - 1000
+INFINITY = MATE_SCORE + 1
+
+ENTRY_BYTES = 16
+BUCKET_SIZE = 2
+
+# Data word layout: move (18 bits) | score (32) | depth (8) | bound (2) | age (4)
+MOVE_BITS, SCORE_BITS, DEPTH_BITS, BOUND_BITS, AGE_BITS = 18, 32, 8, 2, 4
+SCORE_SHIFT = MOVE_BITS
+DEPTH_SHIFT = SCORE_SHIFT + SCORE_BITS
+BOUND_SHIFT = DEPTH_SHIFT + DEPTH_BITS
+AGE_SHIFT = BOUND_SHIFT + BOUND_BITS
+MOVE_MASK = (1 << MOVE_BITS) - 1
+SCORE_OFFSET = 1 << (SCORE_BITS - 1)
+DEPTH_MASK = (1 << DEPTH_BITS) - 1
+AGE_MASK = (1 << AGE_BITS) - 1
+
+# On-disk layout: a fixed header followed by the raw entry array
+FILE_MAGIC = b'QGTT'
+FILE_VERSION = 2
+FILE_HEADER = struct.Struct('<4sIQQI')
+FILE_HEADER_BYTES = 64
+
+def encode_score(score):
+    return int(score) + SCORE_OFFSET
+
+def decode_score(packed):
+    return packed - SCORE_OFFSET
+
+def score_to_table(score, ply):
+    # Mates are stored as distances from this node, not from the root, so an
+    # entry stays right when the position is reached at another ply
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+def score_from_table(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+class TranspositionTable:
+    # Two 64-bit words per entry: key ^ data and data. Storing the key xored
+    # with its data lets a reader detect an entry torn by a concurrent writer.
+    # Each bucket holds a depth-preferred slot and an always-replace slot.
+    def __init__(self, size_mb=16, buffer=None, readonly=False):
+        if buffer is None:
+            buffer = bytearray(size_mb * 1024 * 1024)
+        entries = len(buffer) // ENTRY_BYTES
+        self.buckets = max(1, entries // BUCKET_SIZE)
+        self.buffer = buffer
+        self.table = memoryview(buffer)[:self.buckets * BUCKET_SIZE * ENTRY_BYTES].cast('Q')
+        self.readonly = readonly
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.mapping = None
+        self.file = None
+
+    @classmethod
+    def from_file(cls, path, size_mb=16, readonly=False):
+        # A memory-mapped table persists between runs. Several processes may
+        # map the same file; readers open it read-only and never store.
+        if not os.path.exists(path):
+            if readonly:
+                raise FileNotFoundError(path)
+            with open(path, 'wb') as f:
+                f.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, ZOBRIST_SIGNATURE, 0, 0).ljust(FILE_HEADER_BYTES, b'\0'))
+                f.truncate(FILE_HEADER_BYTES + size_mb * 1024 * 1024)
+        f = open(path, 'rb' if readonly else 'r+b')
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ if readonly else mmap.ACCESS_WRITE)
+        magic, version, signature, _, age = FILE_HEADER.unpack_from(mapping, 0)
+        if magic != FILE_MAGIC or version != FILE_VERSION or signature != ZOBRIST_SIGNATURE:
+            mapping.close()
+            f.close()
+            raise ValueError(f"{path} is not a transposition table for this key schedule")
+        table = cls(buffer=memoryview(mapping)[FILE_HEADER_BYTES:], readonly=readonly)
+        table.age = age
+        table.mapping = mapping
+        table.file = f
+        return table
+
+    def flush(self):
+        if self.mapping is not None and not self.readonly:
+            FILE_HEADER.pack_into(self.mapping, 0, FILE_MAGIC, FILE_VERSION, ZOBRIST_SIGNATURE, 0, self.age)
+            self.mapping.flush()
+
+    def close(self):
+        # Shared or mapped buffers cannot be closed while a view is exported
+        self.flush()
+        self.table.release()
+        if self.mapping is not None:
+            self.buffer.release()
+            self.mapping.close()
+            self.file.close()
+
+    def new_search(self):
+        self.age = (self.age + 1) & AGE_MASK
+
+    def clear(self):
+        if self.readonly:
+            return
+        view = memoryview(self.buffer)
+        view[:] = bytes(len(view))
+        self.age = 0
+
+    def probe(self, key, ply=0):
+        self.probes += 1
+        table = self.table
+        index = (key % self.buckets) * 4
+        for slot in (index, index + 2):
+            data = table[slot + 1]
+            if table[slot] ^ data == key and data:
+                self.hits += 1
+                move = data & MOVE_MASK
+                return (move or None, score_from_table(decode_score((data >> SCORE_SHIFT) & 0xFFFFFFFF), ply),
+                        (data >> DEPTH_SHIFT) & DEPTH_MASK, (data >> BOUND_SHIFT) & 3)
+        return None
+
+    def store(self, key, move, score, depth, bound, ply=0):
+        if self.readonly:
+            return
+        table = self.table
+        index = (key % self.buckets) * 4
+        slot = None
+        for candidate in (index, index + 2):
+            if table[candidate] ^ table[candidate + 1] == key:
+                slot = candidate
+                if not move:
+                    move = table[candidate + 1] & MOVE_MASK
+                break
+        if slot is None:
+            data = table[index + 1]
+            stale = (data >> AGE_SHIFT) & AGE_MASK != self.age
+            if not data or stale or depth >= (data >> DEPTH_SHIFT) & DEPTH_MASK:
+                slot = index
+            else:
+                slot = index + 2
+        data = ((move or 0) & MOVE_MASK) | encode_score(score_to_table(score, ply)) << SCORE_SHIFT | max(0, min(depth, DEPTH_MASK)) << DEPTH_SHIFT | bound << BOUND_SHIFT | self.age << AGE_SHIFT
+        table[slot] = key ^ data
+        table[slot + 1] = data
+
+    def hashfull(self):
+        # Permille of sampled entries written during the current search
+        table = self.table
+        sample = min(1000, len(table) // 2)
+        used = 0
+        for i in range(sample):
+            data = table[2 * i + 1]
+            if data and (data >> AGE_SHIFT) & AGE_MASK == self.age:
+                used += 1
+        return used * 1000 // max(1, sample)
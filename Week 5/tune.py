@@ -0,0 +1,257 @@
+import argparse
+import sys
+import time
+import numpy as np
+import current_engine as engine
+from bitboard import Position, PIECE_SYMBOLS, KING, WHITE_PAWN, BLACK_PAWN, squares
+
+# One weight per (piece type, square) for each game phase. A weight is the
+# piece value plus its square bonus, so material and placement are fitted
+# together and split back into values and pst when the tables are written.
+# The pawn-structure terms are not tuned; they enter as fixed offsets so the
+# tables are fitted against the evaluation the engine actually uses.
+FEATURES = 6 * 64
+RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5, "[1.0]": 1.0, "[0.0]": 0.0, "[0.5]": 0.5}
+
+def is_quiet(position):
+    if position.is_check():
+        return False
+    for move in position.legal_moves(captures_only=True):
+        if position.see(move) > 0:
+            return False
+    return True
+
+def encode(position, rows, columns, signs, row):
+    # White pieces count +1 on their square, black pieces -1 on the square
+    # the engine reads for them (63 - sq), exactly as build_piece_square_tables
+    phase = 0
+    for piece in range(12):
+        piece_type = piece % 6
+        white = piece < 6
+        occupied = squares(position.bb[piece])
+        for sq in occupied:
+            rows.append(row)
+            columns.append(piece_type * 64 + (sq if white else 63 - sq))
+            signs.append(1 if white else -1)
+        phase += engine.phase_weights[PIECE_SYMBOLS[piece_type]] * len(occupied)
+    return min(phase, engine.MAX_PHASE)
+
+def read_pgn_games(path):
+    import chess.pgn
+    with open(path, "r", errors="replace") as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            result = RESULTS.get(game.headers.get("Result"))
+            if result is not None:
+                yield game.board().fen(), [move.uci() for move in game.mainline_moves()], result
+
+def read_labelled_fens(path):
+    # "<fen> <result>" lines, the result as 1-0 / 0-1 / 1/2-1/2 or [1.0] / [0.5] / [0.0]
+    with open(path, "r") as f:
+        for line in f:
+            tokens = line.replace('"', ' ').replace(';', ' ').split()
+            if len(tokens) > 1 and tokens[-1] in RESULTS:
+                yield ' '.join(tokens[:-1]), [], RESULTS[tokens[-1]]
+
+def pawn_offsets(position):
+    return engine.pawn_structure(position, engine.evaluate_pawns(position.bb[WHITE_PAWN], position.bb[BLACK_PAWN]))
+
+def extract_dataset(paths, skip_plies=8, verbose=False):
+    rows, columns, signs, phases, results = [], [], [], [], []
+    pawn_mg, pawn_eg = [], []
+    for path in paths:
+        games = read_pgn_games(path) if path.lower().endswith('.pgn') else read_labelled_fens(path)
+        for fen, moves, result in games:
+            position = Position.from_fen(fen)
+            plies = [None] + moves
+            for ply, uci in enumerate(plies):
+                if uci is not None:
+                    try:
+                        position.make_move(position.parse_uci(uci))
+                    except ValueError:
+                        break
+                if (ply >= skip_plies or not moves) and is_quiet(position):
+                    phases.append(encode(position, rows, columns, signs, len(results)))
+                    results.append(result)
+                    middlegame, endgame = pawn_offsets(position)
+                    pawn_mg.append(middlegame)
+                    pawn_eg.append(endgame)
+        if verbose:
+            print(f"{path}: {len(results)} quiet positions so far", file=sys.stderr)
+    return {
+        "rows": np.array(rows, dtype=np.int32),
+        "columns": np.array(columns, dtype=np.int16),
+        "signs": np.array(signs, dtype=np.int8),
+        "phases": np.array(phases, dtype=np.float64),
+        "results": np.array(results, dtype=np.float64),
+        "pawn_mg": np.array(pawn_mg, dtype=np.float64),
+        "pawn_eg": np.array(pawn_eg, dtype=np.float64),
+    }
+
+def initial_weights():
+    middlegame = np.zeros(FEATURES)
+    endgame = np.zeros(FEATURES)
+    for piece_type in range(6):
+        symbol = PIECE_SYMBOLS[piece_type]
+        # The kings always cancel, so their value stays out of the weights
+        middlegame_value = engine.values[symbol] if piece_type != KING else 0
+        endgame_value = engine.values_endgame[symbol] if piece_type != KING else 0
+        middlegame[piece_type * 64:(piece_type + 1) * 64] = np.array(engine.pst[symbol]) + middlegame_value
+        endgame[piece_type * 64:(piece_type + 1) * 64] = np.array(engine.pst_endgame[symbol]) + endgame_value
+    return middlegame, endgame
+
+class Evaluator:
+    # Sparse linear evaluation over the dataset: every product is a bincount
+    def __init__(self, dataset):
+        self.rows = dataset["rows"]
+        self.columns = dataset["columns"].astype(np.int64)
+        self.signs = dataset["signs"].astype(np.float64)
+        self.results = dataset["results"]
+        self.count = len(self.results)
+        self.middlegame_factor = dataset["phases"] / engine.MAX_PHASE
+        self.endgame_factor = 1 - self.middlegame_factor
+        self.pawn_mg = dataset["pawn_mg"]
+        self.pawn_eg = dataset["pawn_eg"]
+
+    def sums(self, weights):
+        return np.bincount(self.rows, weights=self.signs * weights[self.columns], minlength=self.count)
+
+    def evaluate(self, middlegame, endgame):
+        return (self.sums(middlegame) + self.pawn_mg) * self.middlegame_factor + (self.sums(endgame) + self.pawn_eg) * self.endgame_factor
+
+    def back(self, per_position):
+        return np.bincount(self.columns, weights=self.signs * per_position[self.rows], minlength=FEATURES)
+
+def win_probability(scores, scale):
+    return 1 / (1 + np.power(10.0, -scale * scores / 400))
+
+def loss(evaluator, scores, scale):
+    return float(np.mean((win_probability(scores, scale) - evaluator.results) ** 2))
+
+def fit_scale(evaluator, scores):
+    # Golden-section search for the sigmoid scale that best fits the current tables
+    low, high = 0.1, 3.0
+    ratio = (5 ** 0.5 - 1) / 2
+    for _ in range(40):
+        left, right = high - ratio * (high - low), low + ratio * (high - low)
+        if loss(evaluator, scores, left) < loss(evaluator, scores, right):
+            high = right
+        else:
+            low = left
+    return (low + high) / 2
+
+def tune(evaluator, epochs=500, learning_rate=2.0, verbose=False):
+    middlegame, endgame = initial_weights()
+    scale = fit_scale(evaluator, evaluator.evaluate(middlegame, endgame))
+    # Adam over the full batch: each epoch is two bincount passes per phase
+    parameters = [middlegame, endgame]
+    first = [np.zeros(FEATURES), np.zeros(FEATURES)]
+    second = [np.zeros(FEATURES), np.zeros(FEATURES)]
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    history = []
+    for epoch in range(1, epochs + 1):
+        scores = evaluator.evaluate(middlegame, endgame)
+        probability = win_probability(scores, scale)
+        error = probability - evaluator.results
+        history.append(float(np.mean(error ** 2)))
+        slope = 2 * error * probability * (1 - probability) * scale * np.log(10) / 400 / evaluator.count
+        gradients = [evaluator.back(slope * evaluator.middlegame_factor), evaluator.back(slope * evaluator.endgame_factor)]
+        for i in range(2):
+            first[i] = beta1 * first[i] + (1 - beta1) * gradients[i]
+            second[i] = beta2 * second[i] + (1 - beta2) * gradients[i] ** 2
+            corrected_first = first[i] / (1 - beta1 ** epoch)
+            corrected_second = second[i] / (1 - beta2 ** epoch)
+            parameters[i] -= learning_rate * corrected_first / (np.sqrt(corrected_second) + epsilon)
+        if verbose and (epoch % 50 == 0 or epoch == 1):
+            print(f"epoch {epoch}: loss {history[-1]:.6f}", file=sys.stderr)
+    final = loss(evaluator, evaluator.evaluate(middlegame, endgame), scale)
+    return middlegame, endgame, scale, history[0] if history else final, final
+
+def split_tables(weights, king_value):
+    # Each piece value is the mean weight over the squares it can stand on;
+    # the rest is the square bonus. Pawns never stand on the back ranks.
+    tables, material = {}, {}
+    for piece_type in range(6):
+        symbol = PIECE_SYMBOLS[piece_type]
+        block = weights[piece_type * 64:(piece_type + 1) * 64]
+        if piece_type == KING:
+            material[symbol] = king_value
+            tables[symbol] = [int(round(value)) for value in block]
+            continue
+        playable = block[8:56] if symbol == 'P' else block
+        material[symbol] = int(round(playable.mean()))
+        table = [int(round(value)) - material[symbol] for value in block]
+        if symbol == 'P':
+            table[:8] = [0] * 8
+            table[56:] = [0] * 8
+        tables[symbol] = table
+    return tables, material
+
+def format_tables(name, tables, comment=None):
+    lines = []
+    if comment:
+        lines.append(f"# {comment}")
+    lines.append(f"{name} = {{")
+    for i, symbol in enumerate('PNBRQK'):
+        rows = [', '.join(str(value) for value in tables[symbol][rank * 8:rank * 8 + 8]) for rank in range(8)]
+        body = (',\n' + ' ' * 10).join(rows)
+        lines.append(f"    '{symbol}': ({body}){',' if i < 5 else ''}")
+    lines.append("}")
+    return '\n'.join(lines)
+
+def format_values(material):
+    entries = []
+    for symbol in 'prnbqk':
+        entries.append(f"'{symbol}': {-material[symbol.upper()]}")
+        entries.append(f"'{symbol.upper()}': {material[symbol.upper()]}")
+    entries += [f"'{char}': 0" for char in '/12345678']
+    return "values = {" + ', '.join(entries) + "}"
+
+def format_engine_tables(middlegame, endgame):
+    pst, middlegame_values = split_tables(middlegame, engine.values['K'])
+    pst_endgame, endgame_values = split_tables(endgame, engine.values_endgame['K'])
+    endgame_line = "values_endgame = {" + ', '.join(f"'{symbol}': {endgame_values[symbol]}" for symbol in 'PNBRQK') + "}"
+    return '\n\n'.join([
+        format_tables("pst", pst),
+        format_tables("pst_endgame", pst_endgame, "Endgame piece-square tables, laid out like pst (a1 first)"),
+        format_values(middlegame_values),
+        endgame_line,
+    ]) + '\n'
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Texel-tune the pst/values tables on game outcomes")
+    parser.add_argument("inputs", nargs="*", help=".pgn files, or text files of '<fen> <result>' lines")
+    parser.add_argument("--dataset", help="load quiet positions from this .npz instead of extracting them")
+    parser.add_argument("--save-dataset", help="save the extracted quiet positions to this .npz for later runs")
+    parser.add_argument("--skip-plies", type=int, default=8, help="ignore the opening plies of every game")
+    parser.add_argument("--epochs", type=int, default=500)
+    parser.add_argument("--learning-rate", type=float, default=2.0, help="Adam step size in centipawns")
+    parser.add_argument("--output", help="write the tables to this file instead of stdout")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    start_time = time.time()
+    if args.dataset:
+        dataset = dict(np.load(args.dataset))
+        if "pawn_mg" not in dataset:
+            parser.error(f"{args.dataset} has no pawn-structure offsets; extract it again")
+    elif args.inputs:
+        dataset = extract_dataset(args.inputs, args.skip_plies, args.verbose)
+    else:
+        parser.error("give game files or --dataset")
+    if args.save_dataset:
+        np.savez_compressed(args.save_dataset, **dataset)
+    evaluator = Evaluator(dataset)
+    print(f"{evaluator.count} positions loaded in {time.time() - start_time:.1f}s", file=sys.stderr)
+    if not evaluator.count:
+        sys.exit(1)
+    start_time = time.time()
+    middlegame, endgame, scale, initial_loss, final_loss = tune(evaluator, args.epochs, args.learning_rate, args.verbose)
+    print(f"scale {scale:.3f}, loss {initial_loss:.6f} -> {final_loss:.6f} in {time.time() - start_time:.1f}s", file=sys.stderr)
+    tables = format_engine_tables(middlegame, endgame)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(tables)
+    else:
+        print(tables)
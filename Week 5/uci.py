@@ -0,0 +1,199 @@
+import sys
+import threading
+import chess
+import current_engine as engine
+from bitboard import move_to_uci
+from transposition import MATE_SCORE, MATE_BOUND
+
+ENGINE_NAME = "Queens Gambit"
+ENGINE_AUTHOR = "Queens Gambit mentees"
+
+output_lock = threading.Lock()
+board = chess.Board()
+search_thread = None
+infinite_search = False
+search_options = {}
+hash_size_mb = 16
+multi_pv_lines = 1
+
+def send(line):
+    with output_lock:
+        print(line, flush=True)
+
+def score_string(value, white_to_move):
+    if not white_to_move:
+        value = -value
+    if abs(value) >= MATE_BOUND:
+        # UCI counts mates in moves, not plies
+        plies = MATE_SCORE - abs(value)
+        return f"mate {(plies + 1) // 2}" if value > 0 else f"mate -{plies // 2}"
+    return f"cp {int(value)}"
+
+def stats_string(stats):
+    def rate(value):
+        return f"{value:.3f}" if value is not None else "-"
+    return (f"stats depth {stats['depth']} nodes {stats['nodes']} qnodes {stats['qnodes']} ebf {rate(stats['ebf'])} "
+            f"fmc {rate(stats['first_move_cutoff_rate'])} ttprobes {stats['tt_probes']} tthit {rate(stats['tt_hit_rate'])} "
+            f"ttcut {rate(stats['tt_cutoff_rate'])} pawnhit {rate(stats['pawn_hit_rate'])} itertime {int(stats['time'] * 1000)}")
+
+def report_iteration(depth, value, nodes, elapsed, pv):
+    nps = int(nodes / elapsed) if elapsed > 0 else 0
+    hashfull = engine.transposition_table.hashfull()
+    if multi_pv_lines > 1:
+        for index, (_, line_value, line_pv) in enumerate(engine.multi_pv, 1):
+            pv_string = ' '.join(move_to_uci(action) for action in line_pv)
+            send(f"info depth {depth} multipv {index} score {score_string(line_value, board.turn)} nodes {nodes} nps {nps} time {int(elapsed * 1000)} hashfull {hashfull} pv {pv_string}")
+    else:
+        pv_string = ' '.join(move_to_uci(action) for action in pv)
+        send(f"info depth {depth} score {score_string(value, board.turn)} nodes {nodes} nps {nps} time {int(elapsed * 1000)} hashfull {hashfull} pv {pv_string}")
+    if engine.search_trace:
+        send(f"info string {stats_string(engine.search_trace[-1])}")
+
+def allocate_time(options):
+    if 'movetime' in options:
+        return options['movetime'] / 1000
+    remaining = options.get('wtime' if board.turn else 'btime')
+    if remaining is None:
+        return None
+    increment = options.get('winc' if board.turn else 'binc', 0)
+    moves_to_go = options.get('movestogo', 30)
+    budget = remaining / max(moves_to_go, 1) + increment * 0.8
+    # Keep a reserve for move overhead so we never lose on time
+    return max(0.01, min(budget, remaining * 0.5 - 50) / 1000)
+
+def run_search(search_board, options):
+    best_move = None if infinite_search else engine.book_move(search_board)
+    if best_move is not None:
+        send(f"bestmove {best_move}")
+        return
+    # A ponder search has no deadline until ponderhit gives it one
+    time_limit = None if options.get('ponder') else allocate_time(options)
+    best_move, _ = engine.iterative_deepening(search_board, search_board.turn, options.get('depth', engine.MAX_PLY), time_limit, options.get('nodes'), report_iteration, lines=multi_pv_lines)
+    # UCI forbids sending bestmove before stop in infinite or ponder mode
+    while infinite_search and not engine.stop_event.wait(0.01):
+        pass
+    if best_move is None:
+        send("bestmove 0000")
+        return
+    pv = engine.principal_variation
+    if len(pv) > 1 and move_to_uci(pv[0]) == best_move.uci():
+        send(f"bestmove {best_move} ponder {move_to_uci(pv[1])}")
+    else:
+        send(f"bestmove {best_move}")
+
+def stop_search():
+    global search_thread
+    if search_thread is not None:
+        engine.stop_event.set()
+        search_thread.join()
+        search_thread = None
+
+def handle_position(tokens):
+    global board
+    if not tokens:
+        return
+    if tokens[0] == 'startpos':
+        board = chess.Board()
+        tokens = tokens[1:]
+    elif tokens[0] == 'fen':
+        fen_end = tokens.index('moves') if 'moves' in tokens else len(tokens)
+        board = chess.Board(' '.join(tokens[1:fen_end]))
+        tokens = tokens[fen_end:]
+    if tokens and tokens[0] == 'moves':
+        for uci in tokens[1:]:
+            board.push_uci(uci)
+
+def handle_go(tokens):
+    global search_thread, infinite_search, search_options
+    stop_search()
+    options = {}
+    infinite_search = False
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == 'infinite':
+            infinite_search = True
+        elif tokens[i] == 'ponder':
+            options['ponder'] = True
+            infinite_search = True
+        elif tokens[i] in ('wtime', 'btime', 'winc', 'binc', 'movestogo', 'movetime', 'depth', 'nodes') and i + 1 < len(tokens):
+            options[tokens[i]] = int(tokens[i + 1])
+            i += 1
+        i += 1
+    search_options = options
+    engine.stop_event.clear()
+    engine.search_started.clear()
+    engine.search_finished.clear()
+    search_thread = threading.Thread(target=run_search, args=(board.copy(), options), daemon=True)
+    search_thread.start()
+
+def handle_ponderhit():
+    # The opponent played the expected move: keep searching, now on our clock
+    global infinite_search
+    if search_thread is None or not search_options.get('ponder'):
+        return
+    search_options['ponder'] = False
+    # run_search may already be holding a finished result for us, so let it
+    # send bestmove before waiting on the search
+    infinite_search = False
+    engine.ponder_hit(allocate_time(search_options), search_thread)
+
+def handle_setoption(tokens):
+    global hash_size_mb, multi_pv_lines
+    if 'name' not in tokens or 'value' not in tokens:
+        return
+    name = ' '.join(tokens[tokens.index('name') + 1:tokens.index('value')]).lower()
+    value = ' '.join(tokens[tokens.index('value') + 1:])
+    if name == 'hash':
+        hash_size_mb = int(value)
+        engine.set_hash_size(hash_size_mb)
+    elif name == 'multipv':
+        multi_pv_lines = max(1, int(value))
+    elif name == 'ttfile' and value not in ('', '<empty>'):
+        engine.open_hash_file(value, hash_size_mb)
+    elif name == 'tablebasepath':
+        engine.load_tablebases(value if value not in ('', '<empty>') else None)
+    elif name == 'bookfile':
+        engine.open_opening_book(value if value not in ('', '<empty>') else None)
+
+def uci_loop(stream=sys.stdin):
+    for line in stream:
+        tokens = line.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == 'uci':
+            send(f"id name {ENGINE_NAME}")
+            send(f"id author {ENGINE_AUTHOR}")
+            send("option name Hash type spin default 16 min 1 max 4096")
+            send("option name Ponder type check default false")
+            send("option name MultiPV type spin default 1 min 1 max 256")
+            send("option name TTFile type string default <empty>")
+            send("option name BookFile type string default <empty>")
+            send("option name TablebasePath type string default <empty>")
+            send("uciok")
+        elif command == 'isready':
+            send("readyok")
+        elif command == 'ucinewgame':
+            stop_search()
+            # A persistent table file is kept warm across games
+            if engine.transposition_table.mapping is None:
+                engine.transposition_table.clear()
+        elif command == 'setoption':
+            stop_search()
+            handle_setoption(tokens[1:])
+        elif command == 'position':
+            stop_search()
+            handle_position(tokens[1:])
+        elif command == 'go':
+            handle_go(tokens[1:])
+        elif command == 'ponderhit':
+            handle_ponderhit()
+        elif command == 'stop':
+            stop_search()
+        elif command == 'quit':
+            break
+    stop_search()
+    engine.transposition_table.flush()
+
+if __name__ == "__main__":
+    uci_loop()
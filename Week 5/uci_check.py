@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+# Scripted UCI sessions: each must answer with bestmove and readyok before
+# the timeout. The ponder cases cover a ponder search that finishes on its
+# own (a mate, a depth limit) before ponderhit arrives.
+UCI_SUITE = [
+    ("go_depth", ["position startpos", "go depth 3"], ["bestmove"]),
+    ("go_movetime", ["position startpos moves e2e4", "go movetime 500"], ["bestmove"]),
+    ("ponderhit_while_searching", ["position startpos moves e2e4 e7e5", "go ponder wtime 3000 btime 3000", "sleep 0.5", "ponderhit"], ["bestmove"]),
+    ("ponder_stop", ["position startpos moves e2e4 e7e5", "go ponder wtime 3000 btime 3000", "sleep 0.5", "stop"], ["bestmove"]),
+    ("ponderhit_after_mate", ["position fen 6k1/8/6K1/8/8/3r4/4r3/5R1R w - - 0 1", "go ponder wtime 3000 btime 3000", "sleep 1", "ponderhit"], ["bestmove"]),
+    ("ponderhit_after_depth", ["position startpos", "go ponder wtime 3000 btime 3000 depth 3", "sleep 1", "ponderhit"], ["bestmove"]),
+    ("infinite_stop", ["position startpos", "go infinite", "sleep 0.5", "stop"], ["bestmove"]),
+]
+
+ENGINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uci.py")
+
+def run_session(commands, timeout):
+    # A "sleep N" line pauses between commands instead of being sent. The
+    # session waits for bestmove before it asks isready and quits, so every
+    # search has to end on its own limit, not on quit's implicit stop.
+    engine = subprocess.Popen([sys.executable, ENGINE], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    lines = queue.Queue()
+    output = []
+    deadline = time.time() + timeout
+
+    def read():
+        for line in engine.stdout:
+            lines.put(line.rstrip("\n"))
+
+    def send(command):
+        engine.stdin.write(command + "\n")
+        engine.stdin.flush()
+
+    def wait_for(prefix):
+        while True:
+            try:
+                line = lines.get(timeout=max(0, deadline - time.time()))
+            except queue.Empty:
+                return False
+            output.append(line)
+            if line.startswith(prefix):
+                return True
+
+    threading.Thread(target=read, daemon=True).start()
+    send("uci")
+    send("isready")
+    finished = wait_for("readyok")
+    for command in commands:
+        if command.startswith("sleep "):
+            time.sleep(float(command.split()[1]))
+        else:
+            send(command)
+    if finished and wait_for("bestmove"):
+        send("isready")
+        finished = wait_for("readyok")
+    else:
+        finished = False
+    if finished:
+        send("quit")
+        engine.wait(timeout=max(1, deadline - time.time()))
+    else:
+        engine.kill()
+        engine.wait()
+    return output, not finished
+
+def run_suite(sessions, timeout):
+    results = []
+    for name, commands, expected in sessions:
+        start_time = time.time()
+        lines, timed_out = run_session(commands, timeout)
+        # The second readyok answers the isready sent after the session's commands
+        missing = [prefix for prefix in expected + ["readyok"] if not any(line.startswith(prefix) for line in lines)]
+        if sum(line == "readyok" for line in lines) < 2 and "readyok" not in missing:
+            missing.append("readyok")
+        results.append({
+            "name": name,
+            "ok": not timed_out and not missing,
+            "timed_out": timed_out,
+            "missing": missing,
+            "time": time.time() - start_time,
+        })
+    summary = {"sessions": len(results), "failures": sum(not result["ok"] for result in results)}
+    return results, summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that scripted UCI sessions always end with bestmove and stay responsive")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds allowed per session")
+    parser.add_argument("--only", nargs="*", metavar="NAME", help="run only these sessions")
+    args = parser.parse_args()
+    sessions = [session for session in UCI_SUITE if not args.only or session[0] in args.only]
+    results, summary = run_suite(sessions, args.timeout)
+    for result in results:
+        print(json.dumps(result))
+    print(json.dumps(summary))
+    sys.exit(1 if summary["failures"] else 0)